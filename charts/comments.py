@@ -0,0 +1,104 @@
+"""
+Threaded comments on predictions.
+
+Every reply stores its thread's top-level comment in thread_root, so one
+page of threads loads in three queries however deep or large they are: the
+count for pagination, the top-level page (with reply counts), and every
+reply in those threads. The tree is then assembled in memory in one pass.
+"""
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
+import logging
+
+logger = logging.getLogger(__name__)
+
+COMMENT_THREADS_PAGE_SIZE = 20
+
+
+def _node(comment):
+    return {
+        'id': comment.id,
+        'username': comment.user.username if comment.is_active else None,
+        'content': comment.content if comment.is_active else None,
+        'is_deleted': not comment.is_active,
+        'created_at': comment.created_at.isoformat(),
+        'replies': [],
+    }
+
+
+def load_comment_threads(prediction, page=1, page_size=COMMENT_THREADS_PAGE_SIZE):
+    """
+    One page of top-level threads, newest first, with replies nested oldest
+    first. Deleted comments that still have replies are kept as placeholders.
+    Returns (threads, page_obj).
+    """
+    from charts.models import ChartComment
+
+    top_level = ChartComment.objects.filter(
+        prediction=prediction,
+        parent_comment__isnull=True
+    ).annotate(
+        reply_count=Count('thread_replies', filter=Q(thread_replies__is_active=True))
+    ).filter(
+        Q(is_active=True) | Q(reply_count__gt=0)
+    ).select_related('user').order_by('-created_at', '-id')
+
+    page_obj = Paginator(top_level, page_size).get_page(page)
+    roots = list(page_obj.object_list)
+
+    nodes = {}
+    threads = []
+    for root in roots:
+        node = _node(root)
+        node['reply_count'] = root.reply_count
+        nodes[root.id] = node
+        threads.append(node)
+
+    if roots:
+        replies = ChartComment.objects.filter(
+            thread_root_id__in=list(nodes)
+        ).select_related('user').order_by('created_at', 'id')
+
+        # Parents are always created before their replies, so one ordered pass suffices
+        for reply in replies:
+            parent = nodes.get(reply.parent_comment_id)
+            if parent is None:
+                continue
+            node = _node(reply)
+            nodes[reply.id] = node
+            parent['replies'].append(node)
+
+        for thread in threads:
+            _prune_deleted_leaves(thread)
+
+    return threads, page_obj
+
+
+def _prune_deleted_leaves(node):
+    """Drop deleted replies that have no remaining replies of their own"""
+    node['replies'] = [reply for reply in node['replies'] if not _prune_deleted_leaves(reply)]
+    return node['is_deleted'] and not node['replies']
+
+
+def create_comment(prediction, user, content, parent_id=None):
+    """Add a comment or reply and count it towards the prediction's trending score"""
+    from charts.models import ChartComment
+    from charts import trending
+
+    parent = None
+    if parent_id is not None:
+        parent = ChartComment.objects.get(id=parent_id, prediction=prediction, is_active=True)
+
+    comment = ChartComment.objects.create(
+        prediction=prediction,
+        user=user,
+        content=content,
+        parent_comment=parent
+    )
+
+    try:
+        trending.record_activity({prediction.id: 1}, 'comments')
+    except Exception as e:
+        logger.error(f"Error updating trending scores: {str(e)}")
+
+    return comment
@@ -0,0 +1,300 @@
+"""
+Contest standings maintenance.
+
+Rankings are computed with a RANK() window over each contest's
+participants and written back in bulk, touching only rows whose rank
+actually changed. On PostgreSQL this is a single UPDATE ... FROM.
+
+While a contest runs, live standings are kept in a Redis sorted set per
+contest, updated as participants' predictions settle, and snapshotted to
+ContestParticipation.rank once the contest has ended and every participant's
+prediction has settled (or CONTEST_SETTLEMENT_GRACE_HOURS have passed, so a
+prediction that can never settle doesn't hold up everyone's prizes).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Window
+from django.db.models.functions import Rank
+from django.utils import timezone
+from datetime import timedelta
+from django_redis import get_redis_connection
+import logging
+
+logger = logging.getLogger(__name__)
+
+RANK_UPDATE_BATCH_SIZE = 500
+
+# Live standings stay readable from Redis for a while after the contest ends
+STANDINGS_TTL_AFTER_END_SECONDS = 60 * 60 * 24 * 30
+
+
+def contests_needing_ranking(since=None):
+    """Active contests, limited to those with a participant settled since `since`"""
+    from charts.models import Contest
+
+    contests = Contest.objects.filter(
+        is_active=True,
+        end_date__gte=timezone.now()
+    )
+    if since is not None:
+        contests = contests.filter(participants__prediction__updated_at__gte=since).distinct()
+    return contests
+
+
+def sync_final_accuracy(contest_ids):
+    """Copy settled prediction accuracy onto participations in one UPDATE"""
+    from charts.models import ChartPrediction, ContestParticipation
+
+    accuracy = ChartPrediction.objects.filter(
+        pk=OuterRef('prediction_id')
+    ).values('accuracy_percentage')[:1]
+
+    return ContestParticipation.objects.filter(
+        contest_id__in=contest_ids,
+        final_accuracy__isnull=True,
+        prediction__status='completed',
+        prediction__accuracy_percentage__isnull=False
+    ).update(final_accuracy=Subquery(accuracy))
+
+
+def rank_contests(contest_ids):
+    """
+    Recompute ranks for the given contests.
+
+    Participants sharing a final accuracy share a rank (1, 2, 2, 4...);
+    participants without a final accuracy are unranked. Returns the number
+    of participations whose rank changed.
+    """
+    contest_ids = list(contest_ids)
+    if not contest_ids:
+        return 0
+
+    with transaction.atomic():
+        sync_final_accuracy(contest_ids)
+        if connection.vendor == 'postgresql':
+            return _rank_postgresql(contest_ids)
+        return _rank_with_bulk_update(contest_ids)
+
+
+def _rank_postgresql(contest_ids):
+    from charts.models import ContestParticipation
+
+    table = ContestParticipation._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE {table} AS cp
+            SET "rank" = ranked.new_rank
+            FROM (
+                SELECT id,
+                       CASE WHEN final_accuracy IS NULL THEN NULL
+                            ELSE RANK() OVER (
+                                PARTITION BY contest_id
+                                ORDER BY final_accuracy DESC NULLS LAST
+                            )
+                       END AS new_rank
+                FROM {table}
+                WHERE contest_id = ANY(%s)
+            ) AS ranked
+            WHERE cp.id = ranked.id
+              AND cp."rank" IS DISTINCT FROM ranked.new_rank
+        """, [contest_ids])
+        return cursor.rowcount
+
+
+def _rank_with_bulk_update(contest_ids):
+    """Portable fallback: window-ranked SELECT, then bulk_update of changed rows"""
+    from charts.models import ContestParticipation
+
+    ranked = ContestParticipation.objects.filter(
+        contest_id__in=contest_ids
+    ).annotate(
+        new_rank=Window(
+            expression=Rank(),
+            partition_by=[F('contest_id')],
+            order_by=F('final_accuracy').desc(nulls_last=True)
+        )
+    ).values_list('id', 'rank', 'final_accuracy', 'new_rank')
+
+    changed = []
+    for participation_id, rank, final_accuracy, new_rank in ranked:
+        if final_accuracy is None:
+            new_rank = None
+        if rank != new_rank:
+            changed.append(ContestParticipation(id=participation_id, rank=new_rank))
+
+    ContestParticipation.objects.bulk_update(
+        changed, ['rank'], batch_size=RANK_UPDATE_BATCH_SIZE
+    )
+    return len(changed)
+
+
+class ContestStandings:
+    """Live standings of one contest: sorted set of user ids scored by final accuracy"""
+
+    def __init__(self, contest_id):
+        self.contest_id = contest_id
+        self.key = f"contest:{contest_id}:standings"
+        self.redis = get_redis_connection('default')
+
+    def record(self, accuracies, client=None):
+        """Set {user_id: final_accuracy} for settled participants"""
+        if accuracies:
+            (client or self.redis).zadd(self.key, accuracies)
+
+    def count(self):
+        return self.redis.zcard(self.key)
+
+    def rank(self, user_id):
+        """Competition rank (ties share a rank), or None when not yet settled"""
+        score = self.redis.zscore(self.key, user_id)
+        if score is None:
+            return None
+        return self.redis.zcount(self.key, f"({score}", '+inf') + 1
+
+    def page(self, page=1, page_size=50):
+        """
+        One page of standings, best first, in O(log n + k).
+
+        Only the first entry's rank needs a ZCOUNT; the rest follow from the
+        scores on the page.
+        """
+        page = max(int(page), 1)
+        start = (page - 1) * page_size
+        members = self.redis.zrevrange(self.key, start, start + page_size - 1, withscores=True)
+        if not members:
+            return []
+
+        first_score = members[0][1]
+        rank = self.redis.zcount(self.key, f"({first_score}", '+inf') + 1
+        users = get_user_model().objects.in_bulk([int(member) for member, _ in members])
+
+        entries = []
+        previous_score = first_score
+        for position, (member, score) in enumerate(members):
+            if score != previous_score:
+                rank = start + position + 1
+                previous_score = score
+            user = users.get(int(member))
+            if user is None:
+                continue
+            entries.append({
+                'rank': rank,
+                'user': user,
+                'final_accuracy': round(score, 2),
+            })
+        return entries
+
+    def rebuild(self):
+        """Reload standings from settled participations in the database"""
+        from charts.models import ContestParticipation
+
+        accuracies = dict(ContestParticipation.objects.filter(
+            contest_id=self.contest_id,
+            final_accuracy__isnull=False
+        ).values_list('user_id', 'final_accuracy'))
+
+        staging_key = f"{self.key}:rebuild"
+        pipe = self.redis.pipeline()
+        pipe.delete(staging_key)
+        if accuracies:
+            pipe.zadd(staging_key, accuracies)
+            pipe.rename(staging_key, self.key)
+        else:
+            pipe.delete(self.key)
+        pipe.execute()
+        return len(accuracies)
+
+    def snapshot(self):
+        """Write the live standings to ContestParticipation.rank"""
+        from charts.models import ContestParticipation
+
+        ranks = {}
+        rank = None
+        previous_score = None
+        for position, (member, score) in enumerate(self.redis.zrevrange(self.key, 0, -1, withscores=True)):
+            if score != previous_score:
+                rank = position + 1
+                previous_score = score
+            ranks[int(member)] = rank
+
+        changed = []
+        for participation_id, user_id, current_rank in ContestParticipation.objects.filter(
+            contest_id=self.contest_id
+        ).values_list('id', 'user_id', 'rank'):
+            new_rank = ranks.get(user_id)
+            if new_rank != current_rank:
+                changed.append(ContestParticipation(id=participation_id, rank=new_rank))
+
+        ContestParticipation.objects.bulk_update(
+            changed, ['rank'], batch_size=RANK_UPDATE_BATCH_SIZE
+        )
+        return len(ranks)
+
+
+def record_contest_settlements(prediction_ids):
+    """Push newly settled contest predictions onto their contests' live standings"""
+    from charts.models import ContestParticipation
+
+    participations = ContestParticipation.objects.filter(
+        prediction_id__in=prediction_ids,
+        contest__is_active=True,
+        contest__standings_finalized_at__isnull=True
+    )
+    contest_ids = set(participations.values_list('contest_id', flat=True))
+    if not contest_ids:
+        return 0
+
+    sync_final_accuracy(contest_ids)
+
+    per_contest = {}
+    for contest_id, user_id, final_accuracy in participations.filter(
+        final_accuracy__isnull=False
+    ).values_list('contest_id', 'user_id', 'final_accuracy'):
+        per_contest.setdefault(contest_id, {})[user_id] = final_accuracy
+
+    pipe = get_redis_connection('default').pipeline(transaction=False)
+    for contest_id, accuracies in per_contest.items():
+        ContestStandings(contest_id).record(accuracies, client=pipe)
+    pipe.execute()
+    return sum(len(accuracies) for accuracies in per_contest.values())
+
+
+def contests_ready_to_finalize(now=None):
+    """
+    Ended, unfinalized contests with no participant still waiting on a
+    pending prediction, plus those past the settlement grace period
+    """
+    from charts.models import Contest, ContestParticipation
+
+    now = now or timezone.now()
+    unsettled = ContestParticipation.objects.filter(
+        contest_id=OuterRef('pk'),
+        prediction__status='pending'
+    )
+    return Contest.objects.filter(
+        end_date__lte=now,
+        standings_finalized_at__isnull=True
+    ).filter(
+        ~Exists(unsettled) | Q(end_date__lte=now - timedelta(hours=settings.CONTEST_SETTLEMENT_GRACE_HOURS))
+    )
+
+
+def finalize_ended_contests():
+    """Snapshot live standings to ContestParticipation.rank for contests ready to finalize"""
+    finalized = 0
+    for contest in contests_ready_to_finalize():
+        with transaction.atomic():
+            sync_final_accuracy([contest.id])
+            standings = ContestStandings(contest.id)
+            # Live set missing (evicted or never populated): rebuild from the database
+            if standings.count() == 0:
+                standings.rebuild()
+            standings.snapshot()
+            standings.redis.expire(standings.key, STANDINGS_TTL_AFTER_END_SECONDS)
+
+            contest.standings_finalized_at = timezone.now()
+            contest.save(update_fields=['standings_finalized_at'])
+        finalized += 1
+
+    return finalized
@@ -0,0 +1,160 @@
+"""
+Write-behind counters for ChartPrediction.views_count and likes_count.
+
+Increments go to a Redis hash per field (HINCRBY prediction_id delta), so a
+popular prediction never becomes a hot row. flush_counters() periodically
+moves the accumulated deltas into the database, one
+UPDATE ... SET field = field + delta per distinct delta. Readers that need
+current numbers merge the still-pending deltas with pending_counts() or
+with_pending_counts().
+
+Flushes hold a Redis lock, so two never overlap. Each flushed hash is tagged
+with a batch id that is recorded in the same transaction as its UPDATEs; a
+hash left behind by a flush that died after committing is recognised by
+its batch id and dropped instead of being applied twice.
+"""
+from django.db import transaction
+from django.db.models import F
+from django_redis import get_redis_connection
+from redis.exceptions import LockError
+from . import trending
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('views_count', 'likes_count')
+FLUSH_BATCH_SIZE = 500
+FLUSH_LOCK_KEY = 'counters:chartprediction:flush-lock'
+FLUSH_LOCK_TIMEOUT_SECONDS = 300
+BATCH_ID_FIELD = b'_batch'
+
+
+def _pending_key(field):
+    return f"counters:chartprediction:{field}"
+
+
+def _applied_batch_key(field):
+    return f"counter_flush_batch:{field}"
+
+
+def increment(prediction_id, field, amount=1, client=None):
+    """Buffer an increment (or decrement, with a negative amount)"""
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f"Unknown counter field: {field}")
+    (client or get_redis_connection('default')).hincrby(_pending_key(field), str(prediction_id), amount)
+
+
+def pending_counts(prediction_ids):
+    """Deltas not yet flushed, as {prediction_id: {field: delta}}"""
+    prediction_ids = [str(prediction_id) for prediction_id in prediction_ids]
+    if not prediction_ids:
+        return {}
+
+    pipe = get_redis_connection('default').pipeline(transaction=False)
+    for field in COUNTER_FIELDS:
+        pipe.hmget(_pending_key(field), prediction_ids)
+
+    pending = {}
+    for field, values in zip(COUNTER_FIELDS, pipe.execute()):
+        for prediction_id, value in zip(prediction_ids, values):
+            if value:
+                pending.setdefault(prediction_id, {})[field] = int(value)
+    return pending
+
+
+def with_pending_counts(predictions):
+    """Add pending deltas onto the counter attributes of loaded predictions, in place"""
+    predictions = list(predictions)
+    pending = pending_counts([prediction.id for prediction in predictions])
+    for prediction in predictions:
+        for field, delta in pending.get(str(prediction.id), {}).items():
+            setattr(prediction, field, getattr(prediction, field) + delta)
+    return predictions
+
+
+def _apply(field, deltas, batch_id):
+    """
+    Write a raw HGETALL of {prediction_id: delta} for one field, one UPDATE
+    per distinct delta. Returns rows updated, or None if this batch was
+    already applied.
+    """
+    from charts.models import ChartPrediction
+    from users.models import AppSettings
+
+    by_delta = {}
+    for prediction_id, delta in deltas.items():
+        delta = int(delta)
+        if delta:
+            by_delta.setdefault(delta, []).append(prediction_id.decode())
+
+    updated = 0
+    with transaction.atomic():
+        if AppSettings.get_value(_applied_batch_key(field)) == batch_id:
+            return None
+        for delta, prediction_ids in by_delta.items():
+            for start in range(0, len(prediction_ids), FLUSH_BATCH_SIZE):
+                updated += ChartPrediction.objects.filter(
+                    id__in=prediction_ids[start:start + FLUSH_BATCH_SIZE]
+                ).update(**{field: F(field) + delta})
+        AppSettings.set_value(
+            _applied_batch_key(field),
+            batch_id,
+            description='Last buffered counter batch written to the database'
+        )
+    return updated
+
+
+def flush_counters():
+    """
+    Move buffered deltas into the database.
+
+    The live hash is renamed aside before reading, so increments arriving
+    during the flush land in a fresh hash. A leftover hash from an
+    interrupted flush is finished first. Returns rows updated, or 0 when
+    another flush holds the lock.
+    """
+    redis = get_redis_connection('default')
+    lock = redis.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT_SECONDS)
+    if not lock.acquire(blocking=False):
+        logger.info("Counter flush already running, skipping")
+        return 0
+
+    updated = 0
+    try:
+        for field in COUNTER_FIELDS:
+            key = _pending_key(field)
+            flushing_key = f"{key}:flushing"
+
+            if not redis.exists(flushing_key):
+                if not redis.exists(key):
+                    continue
+                redis.rename(key, flushing_key)
+
+            # Kept if a previous flush already tagged the hash
+            redis.hsetnx(flushing_key, BATCH_ID_FIELD, uuid.uuid4().hex)
+            deltas = redis.hgetall(flushing_key)
+            batch_id = deltas.pop(BATCH_ID_FIELD).decode()
+
+            applied = _apply(field, deltas, batch_id)
+            redis.delete(flushing_key)
+            if applied is None:
+                logger.info(f"Dropped already applied {field} batch {batch_id}")
+                continue
+            updated += applied
+
+            try:
+                trending.record_activity(
+                    {prediction_id.decode(): int(delta) for prediction_id, delta in deltas.items()}, field
+                )
+            except Exception as e:
+                logger.error(f"Error updating trending scores: {str(e)}")
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning("Counter flush outlived its lock")
+
+    if updated:
+        logger.info(f"Flushed buffered counters to {updated} prediction rows")
+    return updated
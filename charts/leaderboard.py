@@ -0,0 +1,339 @@
+"""
+Prediction leaderboards backed by Redis sorted sets.
+
+Every board is a sorted set of user ids scored by ranking_score(), a
+confidence-weighted Bayesian average, plus a hash holding each user's
+accuracy sums and counts; RECORD_SCRIPT applies the same formula in Redis. Settlements update boards
+incrementally, rank lookups are ZREVRANK (O(log n)) and a page of the top-N
+is ZREVRANGE (O(log n + k)). Users below RANKING_MIN_PREDICTIONS on a board
+are tracked but not ranked.
+
+Boards exist for the whole site and per market, each for all time and for
+the current week and month (bucketed by prediction target date).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django_redis import get_redis_connection
+from datetime import timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ('all', 'weekly', 'monthly')
+
+# Period boards are kept a little past their period so "last week" stays readable
+PERIOD_TTL_SECONDS = {
+    'all': 0,
+    'weekly': 60 * 60 * 24 * 7 * 5,
+    'monthly': 60 * 60 * 24 * 400,
+}
+
+REBUILD_BATCH_SIZE = 1000
+# Staging keys outlive a rebuild only if the process dies mid-way
+REBUILD_STAGING_TTL_SECONDS = 3600
+
+# KEYS: board, stats hash.
+# ARGV: user id, accuracy sum, count, weighted accuracy sum, confidence weight
+#       sum (all deltas), ttl, min predictions, prior weight, prior mean
+RECORD_SCRIPT = """
+local id = ARGV[1]
+redis.call('HINCRBYFLOAT', KEYS[2], id .. ':sum', ARGV[2])
+local count = redis.call('HINCRBY', KEYS[2], id .. ':count', ARGV[3])
+local weighted = tonumber(redis.call('HINCRBYFLOAT', KEYS[2], id .. ':wsum', ARGV[4]))
+local weight = tonumber(redis.call('HINCRBYFLOAT', KEYS[2], id .. ':weight', ARGV[5]))
+if count >= tonumber(ARGV[7]) and weight > 0 then
+    local prior_weight = tonumber(ARGV[8])
+    local score = (prior_weight * tonumber(ARGV[9]) + weighted) / (prior_weight + weight)
+    redis.call('ZADD', KEYS[1], score, id)
+else
+    redis.call('ZREM', KEYS[1], id)
+    if count <= 0 then
+        redis.call('HDEL', KEYS[2], id .. ':sum', id .. ':count', id .. ':wsum', id .. ':weight')
+    end
+end
+if tonumber(ARGV[6]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[6])
+    redis.call('EXPIRE', KEYS[2], ARGV[6])
+end
+return count
+"""
+
+
+def ranking_score(count, weighted_accuracy_sum, confidence_weight_sum):
+    """
+    Confidence-weighted Bayesian average, or None below the minimum sample.
+
+    Every user starts from RANKING_PRIOR_WEIGHT pseudo-predictions at
+    RANKING_PRIOR_MEAN accuracy, so a handful of lucky calls cannot top the
+    board. Keep in step with RECORD_SCRIPT.
+    """
+    if count < settings.RANKING_MIN_PREDICTIONS or confidence_weight_sum <= 0:
+        return None
+    prior_weight = settings.RANKING_PRIOR_WEIGHT
+    return (
+        (prior_weight * settings.RANKING_PRIOR_MEAN + weighted_accuracy_sum) /
+        (prior_weight + confidence_weight_sum)
+    )
+
+
+def period_bucket(period, when=None):
+    """Name of the period bucket containing when (defaults to now)"""
+    when = when or timezone.now()
+    if period == 'weekly':
+        year, week, _ = when.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == 'monthly':
+        return when.strftime('%Y-%m')
+    return 'all'
+
+
+def period_start(period, when=None):
+    """Start of the period bucket containing when, or None for all time"""
+    when = timezone.localtime(when or timezone.now())
+    day_start = when.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'weekly':
+        return day_start - timedelta(days=day_start.weekday())
+    if period == 'monthly':
+        return day_start.replace(day=1)
+    return None
+
+
+class Leaderboard:
+    """A single ranking board, e.g. global all-time or one market this week"""
+
+    _record_script = None
+
+    def __init__(self, period='all', market_id=None, when=None):
+        if period not in PERIODS:
+            raise ValueError(f"Unknown leaderboard period: {period}")
+
+        self.period = period
+        self.market_id = market_id
+        scope = f"market:{market_id}" if market_id else 'global'
+        self.key = f"leaderboard:{scope}:{period}:{period_bucket(period, when)}"
+        self.stats_key = f"{self.key}:stats"
+        self.ttl = PERIOD_TTL_SECONDS[period]
+        self.redis = get_redis_connection('default')
+
+    @classmethod
+    def for_prediction(cls, market_id, when):
+        """All boards a settled prediction counts towards"""
+        return [
+            cls(period=period, market_id=scope, when=when)
+            for period in PERIODS
+            for scope in (None, market_id)
+        ]
+
+    def record(self, user_id, delta, client=None):
+        """Atomically apply a UserStats-shaped delta to a user's standing on this board"""
+        if Leaderboard._record_script is None:
+            Leaderboard._record_script = self.redis.register_script(RECORD_SCRIPT)
+        accuracy_sum, count, weighted_sum, weight_sum = delta
+        Leaderboard._record_script(
+            keys=[self.key, self.stats_key],
+            args=[
+                user_id, float(accuracy_sum), int(count), float(weighted_sum), float(weight_sum),
+                self.ttl, settings.RANKING_MIN_PREDICTIONS,
+                float(settings.RANKING_PRIOR_WEIGHT), float(settings.RANKING_PRIOR_MEAN),
+            ],
+            client=client or self.redis
+        )
+
+    def count(self):
+        """Number of ranked users"""
+        return self.redis.zcard(self.key)
+
+    def rank(self, user_id):
+        """1-based rank of a user, or None when unranked"""
+        rank = self.redis.zrevrank(self.key, user_id)
+        return None if rank is None else rank + 1
+
+    def page(self, page=1, page_size=50):
+        """
+        Return one page of entries, best first.
+
+        Each entry is a dict with rank, user, score, accuracy (plain average)
+        and total_predictions; users are loaded with a single query.
+        """
+        page = max(int(page), 1)
+        start = (page - 1) * page_size
+        members = self.redis.zrevrange(self.key, start, start + page_size - 1, withscores=True)
+        if not members:
+            return []
+
+        user_ids = [int(member) for member, _ in members]
+        fields = []
+        for user_id in user_ids:
+            fields.extend([f"{user_id}:sum", f"{user_id}:count"])
+        values = self.redis.hmget(self.stats_key, fields)
+        users = get_user_model().objects.in_bulk(user_ids)
+
+        entries = []
+        for position, (user_id, (_, score)) in enumerate(zip(user_ids, members)):
+            user = users.get(user_id)
+            if user is None:
+                continue
+            accuracy_sum = float(values[position * 2] or 0)
+            count = int(values[position * 2 + 1] or 0)
+            entries.append({
+                'rank': start + position + 1,
+                'user': user,
+                'score': round(score, 1),
+                'accuracy': round(accuracy_sum / count, 1) if count else 0,
+                'total_predictions': count,
+            })
+        return entries
+
+    def cached_page(self, page=1, page_size=50):
+        """page(), cached for LEADERBOARD_CACHE_TIMEOUT; scores are stable enough to reuse"""
+        cache_key = f"{self.key}:page:{page}:{page_size}"
+        entries = cache.get(cache_key)
+        if entries is None:
+            entries = self.page(page, page_size)
+            cache.set(cache_key, entries, settings.LEADERBOARD_CACHE_TIMEOUT)
+        return entries
+
+    def rebuild(self, rows):
+        """
+        Replace the board's contents with rows of (user_id, accuracy_sum,
+        count, weighted_accuracy_sum, confidence_weight_sum)
+        """
+        staging_key = f"{self.key}:rebuild"
+        staging_stats_key = f"{self.stats_key}:rebuild"
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(staging_key, staging_stats_key)
+        ranked = 0
+        has_stats = False
+        scores = {}
+        stats = {}
+        for user_id, accuracy_sum, count, weighted_sum, weight_sum in rows:
+            if not count:
+                continue
+            has_stats = True
+            stats.update({
+                f"{user_id}:sum": accuracy_sum,
+                f"{user_id}:count": count,
+                f"{user_id}:wsum": weighted_sum,
+                f"{user_id}:weight": weight_sum,
+            })
+            score = ranking_score(count, weighted_sum, weight_sum)
+            if score is not None:
+                scores[user_id] = score
+                ranked += 1
+            if len(stats) >= REBUILD_BATCH_SIZE * 4:
+                if scores:
+                    pipe.zadd(staging_key, scores)
+                pipe.hset(staging_stats_key, mapping=stats)
+                pipe.expire(staging_key, REBUILD_STAGING_TTL_SECONDS)
+                pipe.expire(staging_stats_key, REBUILD_STAGING_TTL_SECONDS)
+                scores, stats = {}, {}
+        if scores:
+            pipe.zadd(staging_key, scores)
+        if stats:
+            pipe.hset(staging_stats_key, mapping=stats)
+        pipe.expire(staging_key, REBUILD_STAGING_TTL_SECONDS)
+        pipe.expire(staging_stats_key, REBUILD_STAGING_TTL_SECONDS)
+        pipe.execute()
+
+        # The ranking and the stats hash are swapped independently: users below
+        # RANKING_MIN_PREDICTIONS have stats but no score, and must keep them
+        pipe = self.redis.pipeline()
+        if ranked:
+            pipe.rename(staging_key, self.key)
+        else:
+            pipe.delete(self.key)
+        if has_stats:
+            pipe.rename(staging_stats_key, self.stats_key)
+        else:
+            pipe.delete(self.stats_key)
+        if self.ttl:
+            pipe.expire(self.key, self.ttl)
+            pipe.expire(self.stats_key, self.ttl)
+        else:
+            # Renamed keys keep the staging TTL; the live board must not expire
+            pipe.persist(self.key)
+            pipe.persist(self.stats_key)
+        pipe.delete(staging_key, staging_stats_key)
+        pipe.execute()
+        return ranked
+
+
+def record_settlements(predictions):
+    """Push newly settled predictions onto every board they count towards"""
+    from users.models import UserStats
+
+    deltas = {}
+    for prediction in predictions:
+        if prediction.accuracy_percentage is None:
+            continue
+        for board in Leaderboard.for_prediction(prediction.market_id, prediction.target_date):
+            board_deltas = deltas.setdefault(board.key, (board, {}))[1]
+            delta = UserStats.settlement_delta(prediction.accuracy_percentage, prediction.confidence_level)
+            previous = board_deltas.get(prediction.user_id)
+            if previous:
+                delta = tuple(a + b for a, b in zip(previous, delta))
+            board_deltas[prediction.user_id] = delta
+
+    if not deltas:
+        return 0
+
+    pipe = get_redis_connection('default').pipeline(transaction=False)
+    for board, board_deltas in deltas.values():
+        for user_id, delta in board_deltas.items():
+            board.record(user_id, delta, client=pipe)
+    pipe.execute()
+    return len(deltas)
+
+
+def rebuild_leaderboards():
+    """Rebuild all-time boards and the current weekly/monthly boards from the database"""
+    from charts.models import ChartPrediction
+    from users.models import UserStats
+
+    completed = ChartPrediction.objects.filter(
+        status='completed',
+        accuracy_percentage__isnull=False
+    )
+    rebuilt = 0
+
+    rebuilt += Leaderboard('all').rebuild(
+        UserStats.objects.filter(completed_predictions__gt=0).values_list(
+            'user_id', 'accuracy_sum', 'completed_predictions',
+            'weighted_accuracy_sum', 'confidence_weight_sum'
+        ).iterator()
+    )
+
+    confidence_weight = Cast('confidence_level', FloatField()) / 100.0
+    aggregates = {
+        'accuracy_sum': Sum('accuracy_percentage'),
+        'prediction_count': Count('id'),
+        'weighted_accuracy_sum': Sum(F('accuracy_percentage') * confidence_weight),
+        'confidence_weight_sum': Sum(confidence_weight),
+    }
+
+    for period in PERIODS:
+        start = period_start(period)
+        period_predictions = completed.filter(target_date__gte=start) if start else completed
+
+        if start:
+            rows = period_predictions.values('user_id').annotate(**aggregates).values_list(
+                'user_id', *aggregates
+            )
+            rebuilt += Leaderboard(period).rebuild(rows.iterator())
+
+        per_market = {}
+        for market_id, *row in period_predictions.values(
+            'market_id', 'user_id'
+        ).annotate(**aggregates).values_list('market_id', 'user_id', *aggregates).iterator():
+            per_market.setdefault(market_id, []).append(tuple(row))
+
+        for market_id, rows in per_market.items():
+            rebuilt += Leaderboard(period, market_id=market_id).rebuild(rows)
+
+    logger.info(f"Rebuilt leaderboards with {rebuilt} ranked entries")
+    return rebuilt
@@ -0,0 +1,74 @@
+"""
+Prediction likes.
+
+Liking inserts with ON CONFLICT DO NOTHING and only bumps likes_count (via
+the buffered counters) when a row was actually inserted, so repeated likes
+and unlikes are idempotent. Feed pages resolve "liked by me" for all their
+cards with a single IN query.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from . import counters
+
+
+def _insert_like(prediction_id, user_id):
+    """Insert the like row; returns True only if it didn't already exist"""
+    from charts.models import ChartLike
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {ChartLike._meta.db_table} (prediction_id, user_id, created_at)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (prediction_id, user_id) DO NOTHING
+                RETURNING id
+            """, [prediction_id, user_id, timezone.now()])
+            return cursor.fetchone() is not None
+
+    try:
+        with transaction.atomic():
+            ChartLike.objects.create(prediction_id=prediction_id, user_id=user_id)
+        return True
+    except IntegrityError:
+        return False
+
+
+def like(prediction, user):
+    """Like a prediction; returns True if this call created the like"""
+    created = _insert_like(prediction.id, user.id)
+    if created:
+        counters.increment(prediction.id, 'likes_count', 1)
+    return created
+
+
+def unlike(prediction, user):
+    """Remove a like; returns True if one was removed"""
+    from charts.models import ChartLike
+
+    deleted, _ = ChartLike.objects.filter(prediction=prediction, user=user).delete()
+    if deleted:
+        counters.increment(prediction.id, 'likes_count', -1)
+    return bool(deleted)
+
+
+def liked_prediction_ids(user, prediction_ids):
+    """Which of these predictions the user has liked, in one query"""
+    from charts.models import ChartLike
+
+    if not user.is_authenticated or not prediction_ids:
+        return set()
+    return set(ChartLike.objects.filter(
+        user=user, prediction_id__in=list(prediction_ids)
+    ).values_list('prediction_id', flat=True))
+
+
+def annotate_likes(predictions, user):
+    """
+    Set likes_count (including unflushed likes) and liked on a page of
+    predictions: one Redis round trip and at most one query for the page
+    """
+    predictions = counters.with_pending_counts(predictions)
+    liked = liked_prediction_ids(user, [prediction.id for prediction in predictions])
+    for prediction in predictions:
+        prediction.liked = prediction.id in liked
+    return predictions
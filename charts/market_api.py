@@ -390,27 +390,85 @@ class MarketDataUpdater:
     def update_predictions_accuracy(self):
         """Check and update accuracy for due predictions"""
         from charts.models import ChartPrediction
+        from users.models import UserStats
+        from django.db import transaction
         from django.utils import timezone
         
-        due_predictions = ChartPrediction.objects.filter(
+        due_predictions = list(ChartPrediction.objects.filter(
             status='pending',
             target_date__lte=timezone.now()
-        )
+        ).select_related('market', 'user'))
         
+        # One price lookup per market per run, shared by all its due predictions
+        market_prices = {}
         for prediction in due_predictions:
-            # Get current price for the market
-            current_price = self.api.get_current_price(
-                prediction.market.api_symbol,
-                prediction.market.market_type
-            )
-            
-            if current_price:
+            if prediction.market_id not in market_prices:
+                market_prices[prediction.market_id] = self.api.get_current_price(
+                    prediction.market.api_symbol,
+                    prediction.market.market_type
+                )
+        
+        # Per-user UserStats deltas applied in one batch
+        accuracy_deltas = {}
+        count_deltas = {}
+        settled_predictions = []
+        
+        with transaction.atomic():
+            for prediction in due_predictions:
+                current_price = market_prices[prediction.market_id]
+                if not current_price:
+                    continue
+                
                 prediction.actual_price = current_price
-                prediction.calculate_accuracy()
                 prediction.status = 'completed'
-                prediction.save()
+                prediction.calculate_accuracy()
                 
-                # Update user's overall accuracy
-                prediction.user.update_accuracy_rate(prediction.accuracy_percentage)
+                # Settle with a single claim UPDATE: an overlapping run (or a retry of
+                # this one) that already settled the row matches nothing and applies no
+                # deltas, and counters flushed meanwhile (views, likes) are left alone
+                claimed = ChartPrediction.objects.filter(
+                    pk=prediction.pk, status='pending'
+                ).update(
+                    status='completed',
+                    actual_price=current_price,
+                    accuracy_percentage=prediction.accuracy_percentage,
+                    updated_at=timezone.now()
+                )
+                if not claimed:
+                    continue
+                
+                settled_predictions.append(prediction)
+                user_counts = count_deltas.setdefault(prediction.user_id, {'pending_predictions': 0})
+                user_counts['pending_predictions'] -= 1
+                if prediction.accuracy_percentage is not None:
+                    delta = UserStats.settlement_delta(
+                        prediction.accuracy_percentage, prediction.confidence_level
+                    )
+                    previous = accuracy_deltas.get(prediction.user_id)
+                    if previous:
+                        delta = tuple(a + b for a, b in zip(previous, delta))
+                    accuracy_deltas[prediction.user_id] = delta
                 
                 logger.info(f"Updated prediction {prediction.id} with accuracy {prediction.accuracy_percentage}%")
+            
+            # Update users' overall accuracy and status counts
+            UserStats.apply_deltas(accuracy_deltas)
+            UserStats.adjust_counts(count_deltas)
+        
+        try:
+            from charts.leaderboard import record_settlements
+            record_settlements(settled_predictions)
+        except Exception as e:
+            logger.error(f"Error updating leaderboards: {str(e)}")
+        
+        try:
+            from charts import trending
+            trending.remove([prediction.id for prediction in settled_predictions])
+        except Exception as e:
+            logger.error(f"Error updating trending index: {str(e)}")
+        
+        try:
+            from charts.contests import record_contest_settlements
+            record_contest_settlements([prediction.id for prediction in settled_predictions])
+        except Exception as e:
+            logger.error(f"Error updating contest standings: {str(e)}")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('charts', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contest',
+            name='standings_finalized_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
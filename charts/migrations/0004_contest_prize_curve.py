@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('charts', '0003_contest_standings_finalized_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contest',
+            name='prize_curve',
+            field=models.JSONField(blank=True, default=dict, help_text='Payout curve, see charts/prizes.py'),
+        ),
+        migrations.AddField(
+            model_name='contest',
+            name='prizes_distributed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_thread_roots(apps, schema_editor):
+    ChartComment = apps.get_model('charts', 'ChartComment')
+    
+    # Direct replies to top-level comments, then one reply level per pass
+    ChartComment.objects.filter(
+        parent_comment__isnull=False,
+        parent_comment__parent_comment__isnull=True
+    ).update(thread_root=models.F('parent_comment'))
+    
+    parent_root = ChartComment.objects.filter(
+        pk=OuterRef('parent_comment')
+    ).values('thread_root')[:1]
+    while ChartComment.objects.filter(
+        thread_root__isnull=True,
+        parent_comment__thread_root__isnull=False
+    ).update(thread_root=Subquery(parent_root)):
+        pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('charts', '0004_contest_prize_curve'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chartcomment',
+            name='thread_root',
+            field=models.ForeignKey(blank=True, help_text="Top-level comment of this reply's thread; empty for top-level comments", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread_replies', to='charts.chartcomment'),
+        ),
+        migrations.AddIndex(
+            model_name='chartcomment',
+            index=models.Index(fields=['prediction', 'parent_comment', 'created_at'], name='charts_char_predict_0bc06a_idx'),
+        ),
+        migrations.RunPython(backfill_thread_roots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('charts', '0005_chartcomment_thread_root'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chartprediction',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='charts_char_user_id_e2f3c1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chartprediction',
+            index=models.Index(fields=['market', 'is_public', 'created_at', 'id'], name='charts_char_market__85f5e6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chartprediction',
+            index=models.Index(fields=['is_public', 'created_at', 'id'], name='charts_char_is_publ_2743c2_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('charts', '0006_chartprediction_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chartprediction',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, help_text='When the due-date reminder digest was queued', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='chartprediction',
+            index=models.Index(fields=['status', 'target_date'], name='charts_char_status_82bf8f_idx'),
+        ),
+    ]
@@ -77,6 +77,7 @@ class ChartPrediction(models.Model):
     is_public = models.BooleanField(default=True)
     likes_count = models.IntegerField(default=0)
     views_count = models.IntegerField(default=0)
+    reminder_sent_at = models.DateTimeField(null=True, blank=True, help_text="When the due-date reminder digest was queued")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -84,7 +85,10 @@ class ChartPrediction(models.Model):
         return f"{self.user.email} - {self.market.symbol} prediction"
     
     def calculate_accuracy(self):
-        """Calculate accuracy percentage when actual price is available"""
+        """
+        Set accuracy_percentage from actual_price and return it; saving is
+        left to the caller
+        """
         if self.actual_price and self.predicted_price and self.current_price:
             predicted_change = abs(self.predicted_price - self.current_price)
             actual_change = abs(self.actual_price - self.current_price)
@@ -93,16 +97,27 @@ class ChartPrediction(models.Model):
                 self.accuracy_percentage = 100.0 if actual_change == 0 else 0.0
             else:
                 error_rate = abs(predicted_change - actual_change) / predicted_change
-                self.accuracy_percentage = max(0, 100 - (error_rate * 100))
-            
-            self.save()
+                self.accuracy_percentage = float(max(0, 100 - (error_rate * 100)))
+        return self.accuracy_percentage
     
     def is_prediction_due(self):
         """Check if prediction target date has passed"""
         return timezone.now() >= self.target_date
     
+    def is_settling(self):
+        """Due prediction waiting for the background settlement pipeline"""
+        return self.status == 'pending' and self.is_prediction_due()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination on (created_at, id) per user, per market and for the public feed
+            models.Index(fields=['user', 'created_at', 'id']),
+            models.Index(fields=['market', 'is_public', 'created_at', 'id']),
+            models.Index(fields=['is_public', 'created_at', 'id']),
+            # Reminder sweep and settlement: pending predictions by due date
+            models.Index(fields=['status', 'target_date']),
+        ]
 
 class ChartComment(models.Model):
     """Comments on chart predictions"""
@@ -110,6 +125,10 @@ class ChartComment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     parent_comment = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    thread_root = models.ForeignKey(
+        'self', on_delete=models.CASCADE, null=True, blank=True, related_name='thread_replies',
+        help_text="Top-level comment of this reply's thread; empty for top-level comments"
+    )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -117,8 +136,17 @@ class ChartComment(models.Model):
     def __str__(self):
         return f"Comment by {self.user.email} on {self.prediction.market.symbol}"
     
+    def save(self, *args, **kwargs):
+        if self.parent_comment_id and not self.thread_root_id:
+            parent = self.parent_comment
+            self.thread_root_id = parent.thread_root_id or parent.id
+        super().save(*args, **kwargs)
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['prediction', 'parent_comment', 'created_at']),
+        ]
 
 class ChartLike(models.Model):
     """Like system for chart predictions"""
@@ -166,6 +194,9 @@ class Contest(models.Model):
     max_participants = models.IntegerField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
     rules = models.TextField()
+    prize_curve = models.JSONField(default=dict, blank=True, help_text="Payout curve, see charts/prizes.py")
+    standings_finalized_at = models.DateTimeField(null=True, blank=True)
+    prizes_distributed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -0,0 +1,97 @@
+"""
+Keyset (cursor) pagination for listings ordered newest first.
+
+Pages are ordered by (created_at, id) descending and the next page starts
+strictly after the last row of the current one, so every page is an index
+range scan of the same cost, however deep. Cursors are opaque URL-safe
+tokens; clients only pass back the next_cursor they were given.
+"""
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """One page of results plus the cursor for the page after it"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(obj):
+    payload = json.dumps({'t': obj.created_at.isoformat(), 'id': str(obj.pk)})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (created_at, pk) from a cursor, raising InvalidCursor if it was tampered with"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = parse_datetime(payload['t'])
+        pk = payload['id']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+    if created_at is None or timezone.is_naive(created_at):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+    return created_at, pk
+
+
+def page_size_from(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        return min(max(int(request.GET.get('page_size', default)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return default
+
+
+def keyset_page(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return the page of `queryset` after `cursor` (the first page when empty).
+
+    An invalid cursor raises InvalidCursor; views usually treat it as a
+    request for the first page.
+    """
+    queryset = queryset.order_by('-created_at', '-pk')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        try:
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+            )
+        except ValidationError:
+            raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+
+    # One extra row tells us whether there's a next page without a COUNT
+    items = list(queryset[:page_size + 1])
+    next_cursor = encode_cursor(items[page_size - 1]) if len(items) > page_size else None
+    return KeysetPage(items[:page_size], next_cursor)
+
+
+def keyset_page_for_request(request, queryset, default_page_size=DEFAULT_PAGE_SIZE):
+    """keyset_page() with ?cursor= and ?page_size= taken from the request"""
+    page_size = page_size_from(request, default_page_size)
+    try:
+        return keyset_page(queryset, request.GET.get('cursor'), page_size)
+    except InvalidCursor:
+        return keyset_page(queryset, None, page_size)
@@ -0,0 +1,147 @@
+"""
+Contest prize settlement.
+
+A contest's prize_curve (or DEFAULT_CONTEST_PRIZE_CURVE) says how the prize
+pool is split by finishing position:
+
+    {"type": "top_n", "shares": [50, 30, 20]}
+        Percent of the pool for 1st, 2nd, 3rd...
+
+    {"type": "percentile", "tiers": [{"top_percent": 1, "share": 40},
+                                     {"top_percent": 10, "share": 35},
+                                     {"top_percent": 25, "share": 25}]}
+        Percent of the pool for each band of ranked participants (top 1%,
+        the rest of the top 10%, ...), split evenly across the band.
+
+Participants tied on a rank split the combined payout of the positions they
+occupy. Amounts are rounded down to the cent, so the total paid never
+exceeds the pool.
+
+Settlement writes every prize_won and one LedgerEntry per winner inside a
+single transaction and marks the contest with prizes_distributed_at, so a
+retried run is a no-op.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from decimal import Decimal, ROUND_DOWN
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal('0.01')
+PRIZE_UPDATE_BATCH_SIZE = 500
+
+
+def position_payouts(prize_pool, curve, ranked_count):
+    """Payout per finishing position (index 0 is 1st place) before ties are applied"""
+    prize_pool = Decimal(prize_pool)
+    payouts = [Decimal('0')] * ranked_count
+    curve_type = curve.get('type')
+
+    if curve_type == 'top_n':
+        for position, share in enumerate(curve.get('shares', [])[:ranked_count]):
+            payouts[position] = prize_pool * Decimal(str(share)) / 100
+    elif curve_type == 'percentile':
+        band_start = 0
+        for tier in curve.get('tiers', []):
+            band_end = min(math.ceil(ranked_count * tier['top_percent'] / 100), ranked_count)
+            if band_end <= band_start:
+                continue
+            amount = prize_pool * Decimal(str(tier['share'])) / 100 / (band_end - band_start)
+            for position in range(band_start, band_end):
+                payouts[position] = amount
+            band_start = band_end
+    else:
+        raise ValueError(f"Unknown prize curve type: {curve_type}")
+
+    return payouts
+
+
+def compute_prizes(prize_pool, curve, ranks):
+    """
+    Map participant ids to prizes.
+
+    `ranks` is an iterable of (participant_id, rank) for ranked participants,
+    with competition ranks (1, 2, 2, 4...).
+    """
+    ranks = sorted(ranks, key=lambda item: item[1])
+    payouts = position_payouts(prize_pool, curve, len(ranks))
+
+    tied = {}
+    for participant_id, rank in ranks:
+        tied.setdefault(rank, []).append(participant_id)
+
+    prizes = {}
+    for rank, participant_ids in tied.items():
+        # Tied participants occupy positions rank-1 .. rank-1+len-1
+        combined = sum(payouts[rank - 1:rank - 1 + len(participant_ids)], Decimal('0'))
+        share = (combined / len(participant_ids)).quantize(CENT, rounding=ROUND_DOWN)
+        for participant_id in participant_ids:
+            prizes[participant_id] = share
+    return prizes
+
+
+def distribute_prizes(contest_id):
+    """
+    Settle one contest's prizes. Returns the number of winners paid, or None
+    when the contest isn't ready or was already settled.
+    """
+    from charts.models import Contest, ContestParticipation
+    from payments.models import LedgerEntry
+
+    with transaction.atomic():
+        contest = Contest.objects.select_for_update().get(pk=contest_id)
+        if contest.prizes_distributed_at or not contest.standings_finalized_at:
+            return None
+
+        participations = list(ContestParticipation.objects.filter(
+            contest=contest
+        ).only('id', 'user_id', 'rank', 'prize_won'))
+        prizes = compute_prizes(
+            contest.prize_pool,
+            contest.prize_curve or settings.DEFAULT_CONTEST_PRIZE_CURVE,
+            [(p.id, p.rank) for p in participations if p.rank is not None]
+        )
+
+        changed = []
+        entries = []
+        for participation in participations:
+            prize = prizes.get(participation.id, Decimal('0.00'))
+            if participation.prize_won != prize:
+                participation.prize_won = prize
+                changed.append(participation)
+            if prize > 0:
+                entries.append(LedgerEntry(
+                    user_id=participation.user_id,
+                    entry_type='contest_prize',
+                    amount=prize,
+                    idempotency_key=f"contest-prize:{contest.id}:{participation.user_id}",
+                    description=f"Prize for rank {participation.rank} in {contest.title}"[:255],
+                    metadata={'contest_id': contest.id, 'rank': participation.rank},
+                ))
+
+        ContestParticipation.objects.bulk_update(
+            changed, ['prize_won'], batch_size=PRIZE_UPDATE_BATCH_SIZE
+        )
+        LedgerEntry.objects.bulk_create(
+            entries, batch_size=PRIZE_UPDATE_BATCH_SIZE, ignore_conflicts=True
+        )
+
+        contest.prizes_distributed_at = timezone.now()
+        contest.save(update_fields=['prizes_distributed_at'])
+
+    logger.info(f"Distributed prizes for contest {contest_id} to {len(entries)} winners")
+    return len(entries)
+
+
+def contests_awaiting_prizes():
+    """Ended contests with final standings whose prizes haven't been paid"""
+    from charts.models import Contest
+
+    return Contest.objects.filter(
+        end_date__lte=timezone.now(),
+        standings_finalized_at__isnull=False,
+        prizes_distributed_at__isnull=True
+    )
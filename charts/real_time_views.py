@@ -1,8 +1,11 @@
 from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from charts.views import predictions_view
 from django.views.decorators.cache import cache_page
+from django.db import transaction
 from charts.models import Market, StockData, ChartPrediction
+from users.models import UserStats
 from charts.market_api import StockDataAPI
 from django.utils import timezone
 from decimal import Decimal
@@ -88,17 +91,19 @@ def create_prediction(request):
                 return JsonResponse({'error': 'Free visits exhausted. Please upgrade.'}, status=403)
             
             # Create prediction
-            prediction = ChartPrediction.objects.create(
-                user=request.user,
-                market=market,
-                target_date=target_date,
-                current_price=current_price,
-                predicted_price=predicted_price,
-                duration_days=(target_date.date() - timezone.now().date()).days,
-                confidence_level=confidence_level,
-                notes=notes,
-                is_public=True
-            )
+            with transaction.atomic():
+                prediction = ChartPrediction.objects.create(
+                    user=request.user,
+                    market=market,
+                    target_date=target_date,
+                    current_price=current_price,
+                    predicted_price=predicted_price,
+                    duration_days=(target_date.date() - timezone.now().date()).days,
+                    confidence_level=confidence_level,
+                    notes=notes,
+                    is_public=True
+                )
+                UserStats.record_prediction_created(request.user.id)
             
             # Consume free visit if free user
             if request.user.user_type == 'free':
@@ -157,39 +162,5 @@ def live_price_test(request):
 
 @login_required 
 def user_predictions(request):
-    """Show user's predictions with real accuracy calculations"""
-    predictions = ChartPrediction.objects.filter(
-        user=request.user
-    ).select_related('market').order_by('-created_at')
-    
-    # Update accuracy for completed predictions
-    api = StockDataAPI()
-    for prediction in predictions:
-        if (prediction.status == 'pending' and 
-            prediction.target_date <= timezone.now()):
-            
-            # Get actual current price
-            actual_price = api.get_current_price(
-                prediction.market.api_symbol, 
-                prediction.market.market_type
-            )
-            
-            if actual_price:
-                prediction.actual_price = actual_price
-                prediction.calculate_accuracy()
-                prediction.status = 'completed'
-                prediction.save()
-                
-                # Update user's overall accuracy
-                request.user.update_accuracy_rate(prediction.accuracy_percentage)
-    
-    context = {
-        'predictions': predictions,
-        'user_stats': {
-            'total_predictions': request.user.total_predictions,
-            'accuracy_rate': round(request.user.total_accuracy_rate, 2),
-            'free_visits_remaining': request.user.free_visits_remaining,
-        }
-    }
-    
-    return render(request, 'charts/user_predictions.html', context)
+    """Old my-predictions URL; the page is predictions_view"""
+    return predictions_view(request)
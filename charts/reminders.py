@@ -0,0 +1,88 @@
+"""
+Prediction due-date reminders.
+
+A periodic sweep finds pending predictions whose target date falls inside
+the reminder window (a range scan on the (status, target_date) index),
+groups them per user and queues one digest notification per user for the
+batched dispatcher through create_notifications(). reminder_sent_at marks
+predictions already covered, so a prediction is only ever reminded once.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from datetime import timedelta
+
+REMINDER_SWEEP_USER_BATCH = 500
+
+
+def due_for_reminder(now=None):
+    """Pending predictions due within the reminder window that haven't been reminded"""
+    from charts.models import ChartPrediction
+
+    now = now or timezone.now()
+    return ChartPrediction.objects.filter(
+        status='pending',
+        target_date__gt=now,
+        target_date__lte=now + timedelta(hours=settings.PREDICTION_REMINDER_WINDOW_HOURS),
+        reminder_sent_at__isnull=True
+    )
+
+
+def queue_prediction_reminders(now=None, batch_size=REMINDER_SWEEP_USER_BATCH):
+    """
+    Queue one reminder digest per user with predictions coming due.
+    Returns (digests, predictions).
+    """
+    from charts.models import ChartPrediction
+    from notifications.dispatch import create_notifications
+    from notifications.models import Notification
+    from notifications.templating import render_many
+
+    now = now or timezone.now()
+    user_ids = list(due_for_reminder(now).values_list('user_id', flat=True).distinct().order_by('user_id'))
+
+    digests = 0
+    reminded = 0
+    for start in range(0, len(user_ids), batch_size):
+        with transaction.atomic():
+            predictions = due_for_reminder(now).filter(
+                user_id__in=user_ids[start:start + batch_size]
+            ).select_related('user', 'market').order_by('user_id', 'target_date')
+            if connection.features.has_select_for_update_skip_locked:
+                # An overlapping sweep skips the rows this one is reminding
+                predictions = predictions.select_for_update(skip_locked=True, of=('self',))
+
+            per_user = {}
+            for prediction in predictions:
+                per_user.setdefault(prediction.user, []).append(prediction)
+            if not per_user:
+                continue
+
+            rendered = render_many('prediction_reminder_digest', [
+                (user.preferred_language, {'user': user, 'predictions': user_predictions})
+                for user, user_predictions in per_user.items()
+            ])
+
+            create_notifications([
+                Notification(
+                    user=user,
+                    title=subject,
+                    message=message,
+                    notification_type='email',
+                    category='predictions',
+                    priority='medium',
+                    scheduled_at=now,
+                    metadata={'prediction_ids': [str(prediction.id) for prediction in user_predictions]}
+                )
+                for (user, user_predictions), (subject, message) in zip(per_user.items(), rendered)
+            ])
+
+            prediction_ids = [
+                prediction.id for user_predictions in per_user.values() for prediction in user_predictions
+            ]
+            ChartPrediction.objects.filter(id__in=prediction_ids).update(reminder_sent_at=now)
+
+        digests += len(per_user)
+        reminded += len(prediction_ids)
+
+    return digests, reminded
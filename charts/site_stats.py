@@ -0,0 +1,68 @@
+"""
+Site-wide aggregates shown on the home page.
+
+Everything here is computed by a periodic task and kept in the cache without
+expiry, so page views only read one cache key. A cold cache (first deploy,
+flushed Redis) is filled on the first request.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+from decimal import Decimal
+from .counters import with_pending_counts
+from . import trending
+import logging
+
+logger = logging.getLogger(__name__)
+
+SITE_STATS_CACHE_KEY = 'site_stats'
+TRENDING_PREDICTIONS_LIMIT = 5
+
+
+def compute_site_stats():
+    """Run the aggregate queries; only called from the refresh task or on a cold cache"""
+    from charts.models import ChartPrediction
+    from payments.models import LedgerEntry
+    from users.models import UserStats
+
+    # Per-user sums are far smaller than the predictions table
+    accuracy = UserStats.objects.aggregate(
+        accuracy_sum=Sum('accuracy_sum'),
+        completed=Sum('completed_predictions')
+    )
+    completed = accuracy['completed'] or 0
+    average_accuracy = (accuracy['accuracy_sum'] or 0) / completed if completed else None
+
+    rewards = LedgerEntry.objects.filter(
+        entry_type__in=['contest_prize', 'referral_payout'],
+        amount__gt=0
+    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+
+    trending_predictions = with_pending_counts(trending.top(TRENDING_PREDICTIONS_LIMIT))
+
+    return {
+        'total_users': get_user_model().objects.filter(is_active=True).count(),
+        'total_predictions': ChartPrediction.objects.count(),
+        'completed_predictions': completed,
+        'average_accuracy': average_accuracy,
+        'total_rewards': rewards,
+        'trending_predictions': trending_predictions,
+        'computed_at': timezone.now(),
+    }
+
+
+def refresh_site_stats():
+    """Recompute and store the aggregates"""
+    stats = compute_site_stats()
+    cache.set(SITE_STATS_CACHE_KEY, stats, None)
+    return stats
+
+
+def get_site_stats():
+    """Cached aggregates; computes them once if the cache is cold"""
+    stats = cache.get(SITE_STATS_CACHE_KEY)
+    if stats is None:
+        logger.info("Site stats cache is cold, computing inline")
+        stats = refresh_site_stats()
+    return stats
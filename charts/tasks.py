@@ -1,11 +1,11 @@
 from celery import shared_task
 from django.utils import timezone
-from django.core.mail import send_mail
-from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+CONTEST_RANKINGS_LAST_RUN_KEY = 'contest_rankings_last_run'
+
 @shared_task
 def update_market_data():
     """Update market data for all active markets"""
@@ -33,67 +33,138 @@ def check_prediction_accuracy():
         return f"Error updating prediction accuracy: {str(e)}"
 
 @shared_task
-def send_prediction_reminder(prediction_id):
-    """Send reminder email when prediction target date is approaching"""
+def send_prediction_reminders():
+    """Queue one digest per user for pending predictions coming due soon"""
     try:
-        from charts.models import ChartPrediction
-        
-        prediction = ChartPrediction.objects.get(id=prediction_id)
-        
-        if prediction.status == 'pending':
-            subject = f"Your {prediction.market.symbol} prediction is due soon!"
-            message = f"""
-            Hi {prediction.user.username},
-            
-            Your prediction for {prediction.market.symbol} is due on {prediction.target_date.strftime('%Y-%m-%d')}.
-            
-            Current price: ${prediction.current_price}
-            Your predicted price: ${prediction.predicted_price}
-            
-            We'll automatically check the accuracy when the target date arrives.
-            
-            Best regards,
-            Stock Chart Prediction Team
-            """
-            
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [prediction.user.email],
-                fail_silently=False,
-            )
-            
-            logger.info(f"Reminder email sent for prediction {prediction_id}")
-        
-        return f"Reminder sent for prediction {prediction_id}"
+        from charts.reminders import queue_prediction_reminders
+        
+        digests, reminded = queue_prediction_reminders()
+        
+        logger.info(f"Queued {digests} reminder digests covering {reminded} predictions")
+        return f"Queued {digests} reminder digests covering {reminded} predictions"
     except Exception as e:
-        logger.error(f"Error sending prediction reminder: {str(e)}")
-        return f"Error sending prediction reminder: {str(e)}"
+        logger.error(f"Error queueing prediction reminders: {str(e)}")
+        return f"Error queueing prediction reminders: {str(e)}"
 
 @shared_task
-def calculate_contest_rankings():
-    """Calculate and update contest rankings"""
+def calculate_contest_rankings(full=False):
+    """Calculate and update contest rankings for contests with new settlements"""
     try:
-        from charts.models import Contest, ContestParticipation
+        from charts.contests import ContestStandings, contests_needing_ranking, rank_contests
+        from users.models import AppSettings
+        from django.utils.dateparse import parse_datetime
+        
+        started_at = timezone.now()
+        last_run = None if full else AppSettings.get_value(CONTEST_RANKINGS_LAST_RUN_KEY)
+        since = parse_datetime(last_run) if last_run else None
+        
+        contest_ids = list(contests_needing_ranking(since).values_list('id', flat=True))
+        changed = rank_contests(contest_ids)
+        
+        # Reconcile live standings with the database in case a settlement push was missed
+        for contest_id in contest_ids:
+            ContestStandings(contest_id).rebuild()
         
-        active_contests = Contest.objects.filter(
-            is_active=True,
-            end_date__gte=timezone.now()
+        AppSettings.set_value(
+            CONTEST_RANKINGS_LAST_RUN_KEY,
+            started_at.isoformat(),
+            description='Watermark for incremental contest ranking'
         )
         
-        for contest in active_contests:
-            participants = ContestParticipation.objects.filter(
-                contest=contest,
-                prediction__status='completed'
-            ).order_by('-final_accuracy')
-            
-            for rank, participant in enumerate(participants, 1):
-                participant.rank = rank
-                participant.save()
-        
-        logger.info("Contest rankings updated successfully")
+        logger.info(f"Contest rankings updated for {len(contest_ids)} contests ({changed} ranks changed)")
         return "Contest rankings updated successfully"
     except Exception as e:
         logger.error(f"Error updating contest rankings: {str(e)}")
         return f"Error updating contest rankings: {str(e)}"
+
+@shared_task
+def finalize_contest_standings():
+    """Snapshot live standings to participation ranks for ended contests whose predictions have settled"""
+    try:
+        from charts.contests import finalize_ended_contests
+        
+        finalized = finalize_ended_contests()
+        
+        logger.info(f"Finalized standings for {finalized} contests")
+        return f"Finalized standings for {finalized} contests"
+    except Exception as e:
+        logger.error(f"Error finalizing contest standings: {str(e)}")
+        return f"Error finalizing contest standings: {str(e)}"
+
+@shared_task
+def distribute_contest_prizes(contest_id=None):
+    """Pay out prizes for ended contests; safe to retry"""
+    try:
+        from charts.prizes import contests_awaiting_prizes, distribute_prizes
+        
+        if contest_id is not None:
+            contest_ids = [contest_id]
+        else:
+            contest_ids = list(contests_awaiting_prizes().values_list('id', flat=True))
+        
+        settled = 0
+        for pending_id in contest_ids:
+            try:
+                if distribute_prizes(pending_id) is not None:
+                    settled += 1
+            except Exception as e:
+                logger.error(f"Error distributing prizes for contest {pending_id}: {str(e)}")
+        
+        logger.info(f"Distributed prizes for {settled} contests")
+        return f"Distributed prizes for {settled} contests"
+    except Exception as e:
+        logger.error(f"Error distributing contest prizes: {str(e)}")
+        return f"Error distributing contest prizes: {str(e)}"
+
+@shared_task
+def flush_prediction_counters():
+    """Write buffered view/like counts to the database"""
+    try:
+        from charts.counters import flush_counters
+        
+        updated = flush_counters()
+        
+        return f"Flushed counters for {updated} predictions"
+    except Exception as e:
+        logger.error(f"Error flushing prediction counters: {str(e)}")
+        return f"Error flushing prediction counters: {str(e)}"
+
+@shared_task
+def maintain_trending_index():
+    """Rebase trending scores; a missing index is reseeded by trending.top()"""
+    try:
+        from charts import trending
+        
+        trending.rebase()
+        return "Trending index rebased"
+    except Exception as e:
+        logger.error(f"Error maintaining trending index: {str(e)}")
+        return f"Error maintaining trending index: {str(e)}"
+
+@shared_task
+def refresh_site_stats():
+    """Recompute the cached home page aggregates"""
+    try:
+        from charts.site_stats import refresh_site_stats as refresh
+        
+        stats = refresh()
+        
+        logger.info(f"Site stats refreshed ({stats['total_predictions']} predictions)")
+        return "Site stats refreshed successfully"
+    except Exception as e:
+        logger.error(f"Error refreshing site stats: {str(e)}")
+        return f"Error refreshing site stats: {str(e)}"
+
+@shared_task
+def rebuild_leaderboards():
+    """Rebuild leaderboard sorted sets from the database"""
+    try:
+        from charts.leaderboard import rebuild_leaderboards as rebuild
+        
+        ranked = rebuild()
+        
+        logger.info(f"Leaderboards rebuilt with {ranked} entries")
+        return f"Leaderboards rebuilt with {ranked} entries"
+    except Exception as e:
+        logger.error(f"Error rebuilding leaderboards: {str(e)}")
+        return f"Error rebuilding leaderboards: {str(e)}"
@@ -1,3 +1,569 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from . import counters, likes, trending
+from .comments import load_comment_threads
+from .contests import finalize_ended_contests, rank_contests, record_contest_settlements
+from .leaderboard import Leaderboard, REBUILD_STAGING_TTL_SECONDS
+from .market_api import MarketDataUpdater
+from .models import ChartPrediction, Contest, ContestParticipation, Market
+from .pagination import InvalidCursor, encode_cursor, keyset_page
+from .prizes import distribute_prizes
+from .tasks import maintain_trending_index
+from payments.models import LedgerEntry
+from users.models import AppSettings, UserStats
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+User = get_user_model()
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+REDIS_MODULES = ('charts.leaderboard', 'charts.trending', 'charts.contests', 'charts.counters')
+
+
+@skipUnless(fakeredis, "fakeredis is not installed")
+@override_settings(CACHES=LOCMEM_CACHES)
+class RedisTestCase(TestCase):
+    """Points every Redis-backed charts module at a fresh in-memory server"""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        for module in REDIS_MODULES:
+            patcher = mock.patch(f"{module}.get_redis_connection", return_value=self.redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        Leaderboard._record_script = None
+        trending._scripts.clear()
+
+
+class SettlementTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='carol', email='carol@example.com', password='x')
+        self.market = Market.objects.create(
+            symbol='AAPL', name='Apple', market_type='us_stock', api_symbol='AAPL'
+        )
+        self.predictions = []
+        for _ in range(3):
+            self.predictions.append(ChartPrediction.objects.create(
+                user=self.user,
+                market=self.market,
+                target_date=timezone.now() - timedelta(hours=1),
+                current_price=Decimal('100'),
+                predicted_price=Decimal('110'),
+                duration_days=1,
+                status='pending',
+            ))
+            UserStats.record_prediction_created(self.user.id)
+        self.updater = MarketDataUpdater()
+
+    def settle(self, side_effect=None):
+        with mock.patch.object(
+            self.updater.api, 'get_current_price', return_value=Decimal('105'), side_effect=side_effect
+        ):
+            self.updater.update_predictions_accuracy()
+
+    def test_deltas_are_applied_once(self):
+        self.settle()
+        self.settle()
+
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.completed_predictions, 3)
+        self.assertEqual(stats.pending_predictions, 0)
+        self.assertFalse(ChartPrediction.objects.filter(status='pending').exists())
+
+        accuracy = ChartPrediction.objects.get(pk=self.predictions[0].pk).accuracy_percentage
+        self.assertAlmostEqual(stats.accuracy_sum, 3 * accuracy)
+        board = Leaderboard('all')
+        self.assertEqual(int(self.redis.hget(board.stats_key, f"{self.user.id}:count")), 3)
+
+    def test_rows_settled_by_an_overlapping_run_are_skipped(self):
+        settled_elsewhere = self.predictions[0]
+
+        def overlapping_run(*args):
+            # Another run settles one row after this run has read it as pending
+            ChartPrediction.objects.filter(pk=settled_elsewhere.pk).update(
+                status='completed', actual_price=Decimal('105')
+            )
+            return Decimal('105')
+
+        self.settle(side_effect=overlapping_run)
+
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.completed_predictions, 2)
+        self.assertEqual(stats.pending_predictions, 1)
+        board = Leaderboard('all')
+        self.assertEqual(int(self.redis.hget(board.stats_key, f"{self.user.id}:count")), 2)
+
+    def test_counters_flushed_during_settlement_are_kept(self):
+        def flush_during_fetch(*args):
+            ChartPrediction.objects.update(views_count=F('views_count') + 7, likes_count=F('likes_count') + 2)
+            return Decimal('105')
+
+        self.settle(side_effect=flush_during_fetch)
+
+        for prediction in ChartPrediction.objects.all():
+            self.assertEqual((prediction.views_count, prediction.likes_count), (7, 2))
+            self.assertEqual(prediction.status, 'completed')
+            self.assertIsNotNone(prediction.accuracy_percentage)
+
+
+@override_settings(RANKING_MIN_PREDICTIONS=5)
+class LeaderboardRebuildTests(RedisTestCase):
+    def test_unranked_users_keep_their_stats(self):
+        board = Leaderboard('all')
+        self.assertEqual(board.rebuild([(1, 80.0, 2, 40.0, 1.0)]), 0)
+
+        self.assertEqual(board.count(), 0)
+        self.assertEqual(int(self.redis.hget(board.stats_key, '1:count')), 2)
+
+        # Later settlements continue from the rebuilt counts
+        board.record(1, (90.0, 1, 45.0, 0.5))
+        self.assertEqual(int(self.redis.hget(board.stats_key, '1:count')), 3)
+
+    def test_rebuild_replaces_the_board(self):
+        board = Leaderboard('all')
+        board.rebuild([(1, 400.0, 6, 200.0, 3.0), (2, 80.0, 2, 40.0, 1.0)])
+        self.assertEqual(board.rebuild([(2, 420.0, 6, 210.0, 3.0)]), 1)
+
+        self.assertIsNone(board.rank(1))
+        self.assertEqual(board.rank(2), 1)
+        self.assertIsNone(self.redis.hget(board.stats_key, '1:count'))
+
+        self.assertEqual(board.rebuild([]), 0)
+        self.assertEqual(self.redis.exists(board.key, board.stats_key), 0)
+
+    def test_staging_keys_are_removed(self):
+        for period in ('all', 'weekly'):
+            Leaderboard(period).rebuild([(1, 400.0, 6, 200.0, 3.0), (2, 80.0, 2, 40.0, 1.0)])
+
+        self.assertEqual(self.redis.keys('*:rebuild'), [])
+
+    def test_live_board_expiry(self):
+        rows = [(1, 400.0, 6, 200.0, 3.0)]
+        all_time = Leaderboard('all')
+        all_time.rebuild(rows)
+        self.assertEqual(self.redis.ttl(all_time.key), -1)
+        self.assertEqual(self.redis.ttl(all_time.stats_key), -1)
+
+        weekly = Leaderboard('weekly')
+        weekly.rebuild(rows)
+        self.assertGreater(self.redis.ttl(weekly.key), REBUILD_STAGING_TTL_SECONDS)
+        self.assertGreater(self.redis.ttl(weekly.stats_key), REBUILD_STAGING_TTL_SECONDS)
+
+
+@override_settings(CONTEST_SETTLEMENT_GRACE_HOURS=48)
+class ContestSettlementTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.market = Market.objects.create(
+            symbol='AAPL', name='Apple', market_type='us_stock', api_symbol='AAPL'
+        )
+        self.contest = Contest.objects.create(
+            title='Weekly', description='d', rules='r',
+            start_date=timezone.now() - timedelta(days=7),
+            end_date=timezone.now() - timedelta(hours=1),
+            prize_pool=Decimal('100.00'),
+            prize_curve={'type': 'top_n', 'shares': [60, 40]},
+        )
+
+    def join(self, username, accuracy=None):
+        user = User.objects.create_user(username=username, email=f"{username}@example.com", password='x')
+        prediction = ChartPrediction.objects.create(
+            user=user,
+            market=self.market,
+            target_date=timezone.now() - timedelta(hours=2),
+            current_price=Decimal('100'),
+            predicted_price=Decimal('110'),
+            duration_days=1,
+            status='pending' if accuracy is None else 'completed',
+            accuracy_percentage=accuracy,
+        )
+        ContestParticipation.objects.create(contest=self.contest, user=user, prediction=prediction)
+        record_contest_settlements([prediction.id])
+        return user, prediction
+
+    def settle(self, prediction, accuracy):
+        ChartPrediction.objects.filter(pk=prediction.pk).update(status='completed', accuracy_percentage=accuracy)
+        record_contest_settlements([prediction.id])
+
+    def prizes(self):
+        return dict(LedgerEntry.objects.filter(entry_type='contest_prize').values_list('user__username', 'amount'))
+
+    def test_waits_for_pending_predictions_before_paying(self):
+        self.join('early', accuracy=70.0)
+        _, late_prediction = self.join('late')
+
+        self.assertEqual(finalize_ended_contests(), 0)
+        self.assertIsNone(distribute_prizes(self.contest.id))
+        self.assertEqual(self.prizes(), {})
+
+        # Settles after the contest has ended and still counts
+        self.settle(late_prediction, 90.0)
+        self.assertEqual(finalize_ended_contests(), 1)
+        self.assertEqual(distribute_prizes(self.contest.id), 2)
+
+        ranks = dict(ContestParticipation.objects.values_list('user__username', 'rank'))
+        self.assertEqual(ranks, {'late': 1, 'early': 2})
+        self.assertEqual(self.prizes(), {'late': Decimal('60.00'), 'early': Decimal('40.00')})
+
+    def test_finalizes_after_grace_period(self):
+        Contest.objects.filter(pk=self.contest.pk).update(end_date=timezone.now() - timedelta(hours=49))
+        self.join('settled', accuracy=70.0)
+        self.join('never')
+
+        self.assertEqual(finalize_ended_contests(), 1)
+        self.assertEqual(distribute_prizes(self.contest.id), 1)
+
+        ranks = dict(ContestParticipation.objects.values_list('user__username', 'rank'))
+        self.assertEqual(ranks, {'settled': 1, 'never': None})
+        self.assertEqual(self.prizes(), {'settled': Decimal('60.00')})
+
+    def test_ties_split_and_retries_pay_nothing_more(self):
+        self.join('a', accuracy=80.0)
+        self.join('b', accuracy=80.0)
+
+        finalize_ended_contests()
+        self.assertEqual(distribute_prizes(self.contest.id), 2)
+        self.assertIsNone(distribute_prizes(self.contest.id))
+        self.assertEqual(finalize_ended_contests(), 0)
+
+        self.assertEqual(self.prizes(), {'a': Decimal('50.00'), 'b': Decimal('50.00')})
+        self.assertEqual(LedgerEntry.objects.count(), 2)
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=24)
+class TrendingTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='frank', email='frank@example.com', password='x')
+        market = Market.objects.create(symbol='AAPL', name='Apple', market_type='us_stock', api_symbol='AAPL')
+        self.old, self.new = [
+            ChartPrediction.objects.create(
+                user=user, market=market, target_date=timezone.now() + timedelta(days=7),
+                current_price=Decimal('100'), predicted_price=Decimal('110'), duration_days=7,
+                status='pending', is_public=True,
+            )
+            for _ in range(2)
+        ]
+        ChartPrediction.objects.filter(pk=self.old.pk).update(created_at=timezone.now() - timedelta(days=2))
+
+    def test_cold_start_seeds_from_the_database(self):
+        ChartPrediction.objects.filter(pk=self.old.pk).update(views_count=50)
+
+        self.assertEqual(trending.top(), [self.old])
+        self.assertTrue(self.redis.exists(trending.TRENDING_EPOCH_KEY))
+        # Stored activity is treated as happening at created_at, two half-lives ago
+        self.assertAlmostEqual(self.redis.zscore(trending.TRENDING_KEY, str(self.old.id)), 12.5, places=2)
+
+    def test_maintenance_keeps_fresh_activity_on_older_predictions(self):
+        trending.top()
+        ChartPrediction.objects.filter(pk=self.old.pk).update(likes_count=10)
+        ChartPrediction.objects.filter(pk=self.new.pk).update(likes_count=5)
+        trending.record_activity({self.old.id: 10, self.new.id: 5}, 'likes_count')
+        self.assertEqual(trending.top(), [self.old, self.new])
+
+        maintain_trending_index()
+
+        # Rebasing only rescales; a reseed would backdate the old prediction's likes and demote it
+        self.assertEqual(trending.top(), [self.old, self.new])
+        self.assertAlmostEqual(self.redis.zscore(trending.TRENDING_KEY, str(self.old.id)), 30.0, places=2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PredictionsPageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='gina', email='gina@example.com', password='x')
+        self.client.force_login(self.user)
+        market = Market.objects.create(symbol='AAPL', name='Apple', market_type='us_stock', api_symbol='AAPL')
+        for _ in range(3):
+            ChartPrediction.objects.create(
+                user=self.user, market=market, target_date=timezone.now() - timedelta(hours=1),
+                current_price=Decimal('100'), predicted_price=Decimal('110'), duration_days=1, status='pending',
+            )
+
+    def test_my_predictions_is_the_predictions_page(self):
+        response = self.client.get(reverse('charts:user_predictions'), {'page_size': 2})
+
+        self.assertTemplateUsed(response, 'charts/predictions.html')
+        self.assertEqual(len(response.context['predictions']), 2)
+        self.assertIsNotNone(response.context['next_cursor'])
+
+        response = self.client.get(reverse('charts:user_predictions'), {'cursor': response.context['next_cursor']})
+        self.assertEqual(len(response.context['predictions']), 1)
+
+
+class ContestRankingTests(TestCase):
+    def setUp(self):
+        market = Market.objects.create(symbol='AAPL', name='Apple', market_type='us_stock', api_symbol='AAPL')
+        self.contests = [
+            Contest.objects.create(
+                title=f"Contest {i}", description='d', rules='r', prize_pool=Decimal('0'),
+                start_date=timezone.now() - timedelta(days=1), end_date=timezone.now() + timedelta(days=1),
+            )
+            for i in range(2)
+        ]
+        self.users = {}
+        for contest, entries in zip(self.contests, [
+            [('a', 90.0), ('b', 80.0), ('c', 80.0), ('d', 70.0), ('e', None)],
+            [('a', 10.0), ('b', 20.0)],
+        ]):
+            for username, accuracy in entries:
+                user = self.users.get(username) or User.objects.create_user(
+                    username=username, email=f"{username}@example.com", password='x'
+                )
+                self.users[username] = user
+                prediction = ChartPrediction.objects.create(
+                    user=user, market=market, target_date=timezone.now() - timedelta(hours=1),
+                    current_price=Decimal('100'), predicted_price=Decimal('110'), duration_days=1,
+                    status='pending' if accuracy is None else 'completed', accuracy_percentage=accuracy,
+                )
+                ContestParticipation.objects.create(contest=contest, user=user, prediction=prediction)
+
+    def ranks(self, contest):
+        return dict(ContestParticipation.objects.filter(contest=contest).values_list('user__username', 'rank'))
+
+    def test_ranks_each_contest_with_shared_ranks_for_ties(self):
+        self.assertEqual(rank_contests([contest.id for contest in self.contests]), 6)
+
+        self.assertEqual(self.ranks(self.contests[0]), {'a': 1, 'b': 2, 'c': 2, 'd': 4, 'e': None})
+        self.assertEqual(self.ranks(self.contests[1]), {'b': 1, 'a': 2})
+        self.assertEqual(
+            ContestParticipation.objects.get(contest=self.contests[0], user=self.users['a']).final_accuracy, 90.0
+        )
+
+    def test_only_changed_ranks_are_written(self):
+        rank_contests([self.contests[0].id])
+        self.assertEqual(rank_contests([self.contests[0].id]), 0)
+
+        ChartPrediction.objects.filter(user=self.users['e'], status='pending').update(
+            status='completed', accuracy_percentage=95.0
+        )
+        self.assertEqual(rank_contests([self.contests[0].id]), 5)
+        self.assertEqual(self.ranks(self.contests[0]), {'e': 1, 'a': 2, 'b': 3, 'c': 3, 'd': 5})
+        self.assertEqual(self.ranks(self.contests[1]), {'a': None, 'b': None})
+
+
+class CounterFlushTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='hank', email='hank@example.com', password='x')
+        market = Market.objects.create(symbol='AAPL', name='Apple', market_type='us_stock', api_symbol='AAPL')
+        self.first, self.second = [
+            ChartPrediction.objects.create(
+                user=user, market=market, target_date=timezone.now() + timedelta(days=1),
+                current_price=Decimal('100'), predicted_price=Decimal('110'), duration_days=1,
+            )
+            for _ in range(2)
+        ]
+
+    def counts(self, prediction):
+        prediction.refresh_from_db()
+        return prediction.views_count, prediction.likes_count
+
+    def test_buffered_increments_are_merged_and_flushed_once(self):
+        for _ in range(3):
+            counters.increment(self.first.id, 'views_count')
+        counters.increment(self.second.id, 'views_count')
+        counters.increment(self.first.id, 'likes_count', 2)
+        counters.increment(self.first.id, 'likes_count', -1)
+
+        self.assertEqual(self.counts(self.first), (0, 0))
+        merged = counters.with_pending_counts(ChartPrediction.objects.filter(pk=self.first.pk))
+        self.assertEqual((merged[0].views_count, merged[0].likes_count), (3, 1))
+
+        self.assertEqual(counters.flush_counters(), 3)
+        self.assertEqual(self.counts(self.first), (3, 1))
+        self.assertEqual(self.counts(self.second), (1, 0))
+        self.assertEqual(counters.pending_counts([self.first.id, self.second.id]), {})
+
+        self.assertEqual(counters.flush_counters(), 0)
+        self.assertEqual(self.counts(self.first), (3, 1))
+
+    def test_leftover_of_an_applied_batch_is_dropped(self):
+        counters.increment(self.first.id, 'views_count', 5)
+        counters.flush_counters()
+
+        # A flush that died after committing left its tagged hash behind
+        batch_id = AppSettings.get_value(counters._applied_batch_key('views_count'))
+        leftover = f"{counters._pending_key('views_count')}:flushing"
+        self.redis.hset(leftover, mapping={str(self.first.id): 5, counters.BATCH_ID_FIELD: batch_id})
+        counters.increment(self.first.id, 'views_count', 1)
+
+        # The leftover is finished (here: dropped) first; new increments wait for the next flush
+        counters.flush_counters()
+        self.assertEqual(self.counts(self.first), (5, 0))
+        self.assertFalse(self.redis.exists(leftover))
+
+        counters.flush_counters()
+        self.assertEqual(self.counts(self.first), (6, 0))
+
+    def test_flush_is_skipped_while_another_holds_the_lock(self):
+        counters.increment(self.first.id, 'views_count')
+        lock = self.redis.lock(counters.FLUSH_LOCK_KEY, timeout=60)
+        self.assertTrue(lock.acquire(blocking=False))
+
+        self.assertEqual(counters.flush_counters(), 0)
+        self.assertEqual(self.counts(self.first), (0, 0))
+
+        lock.release()
+        self.assertEqual(counters.flush_counters(), 1)
+
+
+class PredictionCommentsApiTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='ivan', email='ivan@example.com', password='x')
+        self.client.force_login(self.user)
+        market = Market.objects.create(symbol='AAPL', name='Apple', market_type='us_stock', api_symbol='AAPL')
+        self.prediction = ChartPrediction.objects.create(
+            user=self.user, market=market, target_date=timezone.now() + timedelta(days=1),
+            current_price=Decimal('100'), predicted_price=Decimal('110'), duration_days=1,
+        )
+        self.url = reverse('charts_api:api_prediction_comments', args=[self.prediction.id])
+
+    def post(self, body):
+        return self.client.post(self.url, body, content_type='application/json')
+
+    def test_replies_are_nested_under_their_thread(self):
+        root = self.post({'content': ' First! '}).json()['comment']
+        reply = self.post({'content': 'Reply', 'parent_id': root['id']})
+        self.assertEqual(reply.status_code, 201)
+        self.post({'content': 'Nested', 'parent_id': str(reply.json()['comment']['id'])})
+        self.post({'content': 'Second'})
+
+        with self.assertNumQueries(3):
+            load_comment_threads(self.prediction)
+
+        response = self.client.get(self.url)
+        threads = response.json()['threads']
+        self.assertEqual(response.json()['total_threads'], 2)
+        self.assertEqual([thread['content'] for thread in threads], ['Second', 'First!'])
+        self.assertEqual(threads[1]['reply_count'], 2)
+        self.assertEqual(threads[1]['replies'][0]['content'], 'Reply')
+        self.assertEqual(threads[1]['replies'][0]['replies'][0]['content'], 'Nested')
+
+    def test_rejects_malformed_payloads(self):
+        for body in ('{not json', '[1, 2]', {'content': '  '}, {'content': 5},
+                     {'content': 'x', 'parent_id': True}, {'content': 'x', 'parent_id': 'abc'}):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+        self.assertFalse(self.prediction.comments.exists())
+
+    def test_reply_to_a_missing_parent_is_not_found(self):
+        self.assertEqual(self.post({'content': 'x', 'parent_id': 999}).status_code, 404)
+
+    def test_anonymous_users_can_read_but_not_post(self):
+        self.post({'content': 'Hello'})
+        self.client.logout()
+
+        self.assertEqual(len(self.client.get(self.url).json()['threads']), 1)
+        self.assertEqual(self.post({'content': 'Anonymous'}).status_code, 401)
+
+
+class PredictionLikeApiTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='jill', email='jill@example.com', password='x')
+        self.other = User.objects.create_user(username='kurt', email='kurt@example.com', password='x')
+        self.client.force_login(self.user)
+        market = Market.objects.create(symbol='AAPL', name='Apple', market_type='us_stock', api_symbol='AAPL')
+        self.liked, self.unliked, self.private = [
+            ChartPrediction.objects.create(
+                user=self.other, market=market, target_date=timezone.now() + timedelta(days=1),
+                current_price=Decimal('100'), predicted_price=Decimal('110'), duration_days=1, is_public=is_public,
+            )
+            for is_public in (True, True, False)
+        ]
+
+    def url(self, prediction):
+        return reverse('charts_api:api_prediction_like', args=[prediction.id])
+
+    def test_like_and_unlike_are_idempotent(self):
+        first = self.client.post(self.url(self.liked)).json()
+        again = self.client.post(self.url(self.liked)).json()
+        self.assertEqual((first['changed'], first['likes_count']), (True, 1))
+        self.assertEqual((again['changed'], again['likes_count']), (False, 1))
+
+        first = self.client.delete(self.url(self.liked)).json()
+        again = self.client.delete(self.url(self.liked)).json()
+        self.assertEqual((first['liked'], first['changed'], first['likes_count']), (False, True, 0))
+        self.assertEqual((again['changed'], again['likes_count']), (False, 0))
+
+        counters.flush_counters()
+        self.liked.refresh_from_db()
+        self.assertEqual(self.liked.likes_count, 0)
+
+    def test_private_predictions_of_others_cannot_be_liked(self):
+        self.assertEqual(self.client.post(self.url(self.private)).status_code, 404)
+        self.assertFalse(self.private.likes.exists())
+
+    def test_liked_lookup_returns_only_the_users_likes(self):
+        self.client.post(self.url(self.liked))
+        ids = ','.join([str(self.liked.id), str(self.unliked.id), 'not-a-uuid'])
+
+        with self.assertNumQueries(1):
+            liked = likes.liked_prediction_ids(self.user, [self.liked.id, self.unliked.id])
+        self.assertEqual(liked, {self.liked.id})
+
+        response = self.client.get(reverse('charts_api:api_liked_predictions'), {'ids': ids})
+        self.assertEqual(response.json(), {'liked': [str(self.liked.id)]})
+
+
+class KeysetPaginationTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='lena', email='lena@example.com', password='x')
+        market = Market.objects.create(symbol='AAPL', name='Apple', market_type='us_stock', api_symbol='AAPL')
+        for _ in range(5):
+            ChartPrediction.objects.create(
+                user=user, market=market, target_date=timezone.now() + timedelta(days=1),
+                current_price=Decimal('100'), predicted_price=Decimal('110'), duration_days=1,
+            )
+        # Rows sharing a timestamp must still page in a stable order without repeats
+        ChartPrediction.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        ChartPrediction.objects.create(
+            user=user, market=market, target_date=timezone.now() + timedelta(days=1),
+            current_price=Decimal('100'), predicted_price=Decimal('110'), duration_days=1, is_public=False,
+        )
+        self.expected = list(ChartPrediction.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+
+    def test_pages_cover_every_row_once_in_order(self):
+        seen, cursor = [], None
+        while True:
+            page = keyset_page(ChartPrediction.objects.all(), cursor, page_size=2)
+            seen.extend(prediction.pk for prediction in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(page), 2)
+
+    def test_tampered_cursors_are_rejected(self):
+        for cursor in ('garbage', encode_cursor(ChartPrediction.objects.first())[:-4]):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(InvalidCursor):
+                    keyset_page(ChartPrediction.objects.all(), cursor)
+
+    def test_recent_predictions_api_pages_public_predictions(self):
+        url = reverse('charts_api:api_recent_predictions')
+        first = self.client.get(url, {'page_size': 3}).json()
+        second = self.client.get(url, {'page_size': 3, 'cursor': first['next_cursor']}).json()
+
+        public = [str(pk) for pk in self.expected[1:]]
+        self.assertEqual([p['id'] for p in first['predictions'] + second['predictions']], public)
+        self.assertIsNone(second['next_cursor'])
+
+        # An invalid cursor falls back to the first page
+        fallback = self.client.get(url, {'page_size': 3, 'cursor': 'garbage'}).json()
+        self.assertEqual(fallback['predictions'], first['predictions'])
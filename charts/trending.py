@@ -0,0 +1,190 @@
+"""
+Time-decayed trending index for public, pending predictions.
+
+Scores live in a Redis sorted set. Each view, like or comment adds
+weight * 2 ** ((now - epoch) / half_life) to its prediction, which is the
+same ordering as decaying every existing score by half each half-life, but
+only touches the prediction that saw activity. rebase() periodically moves
+the epoch forward and scales every score down so the numbers stay small.
+Reading the top K is a ZREVRANGE.
+
+Activity is fed from the buffered counter flush (views, likes) and from
+comment creation. rebuild() is only the cold-start path: top() reseeds the
+index from the database when the epoch key is missing. It can't know when
+past activity happened, so it must not replace a live, incrementally
+decayed index.
+"""
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from django_redis import get_redis_connection
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+TRENDING_KEY = 'trending:predictions'
+TRENDING_EPOCH_KEY = 'trending:predictions:epoch'
+
+ACTIVITY_WEIGHTS = {
+    'views_count': 1.0,
+    'likes_count': 3.0,
+    'comments': 5.0,
+}
+
+# Scores below this after a rebase (a single view roughly seven half-lives old) are dropped
+PRUNE_BELOW_SCORE = 0.01
+
+# KEYS: sorted set, epoch. ARGV: now, half-life seconds, then member/weight pairs
+RECORD_SCRIPT = """
+local epoch = tonumber(redis.call('GET', KEYS[2]))
+if not epoch then
+    epoch = tonumber(ARGV[1])
+    redis.call('SET', KEYS[2], ARGV[1])
+end
+local boost = math.pow(2, (tonumber(ARGV[1]) - epoch) / tonumber(ARGV[2]))
+for i = 3, #ARGV, 2 do
+    redis.call('ZINCRBY', KEYS[1], tonumber(ARGV[i + 1]) * boost, ARGV[i])
+end
+return #ARGV / 2 - 1
+"""
+
+# KEYS: sorted set, epoch. ARGV: now, half-life seconds, prune threshold
+REBASE_SCRIPT = """
+local epoch = tonumber(redis.call('GET', KEYS[2]))
+if not epoch then
+    return 0
+end
+local factor = math.pow(2, -(tonumber(ARGV[1]) - epoch) / tonumber(ARGV[2]))
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('ZUNIONSTORE', KEYS[1], 1, KEYS[1], 'WEIGHTS', tostring(factor))
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[3])
+end
+redis.call('SET', KEYS[2], ARGV[1])
+return 1
+"""
+
+_scripts = {}
+
+
+def _script(redis, source):
+    if source not in _scripts:
+        _scripts[source] = redis.register_script(source)
+    return _scripts[source]
+
+
+def _half_life_seconds():
+    return settings.TRENDING_HALF_LIFE_HOURS * 3600
+
+
+def record_activity(deltas, kind):
+    """
+    Add {prediction_id: count} of one activity kind to the index.
+
+    Only public, pending predictions are tracked.
+    """
+    from charts.models import ChartPrediction
+
+    weight = ACTIVITY_WEIGHTS[kind]
+    deltas = {str(prediction_id): count for prediction_id, count in deltas.items() if count > 0}
+    if not deltas:
+        return 0
+
+    trending_ids = ChartPrediction.objects.filter(
+        id__in=list(deltas), is_public=True, status='pending'
+    ).values_list('id', flat=True)
+
+    args = [timezone.now().timestamp(), _half_life_seconds()]
+    for prediction_id in trending_ids:
+        args.extend([str(prediction_id), deltas[str(prediction_id)] * weight])
+    if len(args) == 2:
+        return 0
+
+    redis = get_redis_connection('default')
+    return _script(redis, RECORD_SCRIPT)(keys=[TRENDING_KEY, TRENDING_EPOCH_KEY], args=args)
+
+
+def remove(prediction_ids):
+    """Drop predictions that are no longer eligible (settled, deleted, made private)"""
+    prediction_ids = [str(prediction_id) for prediction_id in prediction_ids]
+    if prediction_ids:
+        get_redis_connection('default').zrem(TRENDING_KEY, *prediction_ids)
+
+
+def rebase():
+    """Move the epoch to now, scaling scores down and pruning ones that have decayed away"""
+    redis = get_redis_connection('default')
+    return _script(redis, REBASE_SCRIPT)(
+        keys=[TRENDING_KEY, TRENDING_EPOCH_KEY],
+        args=[timezone.now().timestamp(), _half_life_seconds(), PRUNE_BELOW_SCORE]
+    )
+
+
+def rebuild():
+    """
+    Reseed the index from stored counts, treating all of a prediction's
+    activity as happening when it was created
+    """
+    from charts.models import ChartPrediction
+
+    now = timezone.now()
+    half_life = _half_life_seconds()
+    scores = {}
+    for prediction_id, created_at, views, likes, comments in ChartPrediction.objects.filter(
+        is_public=True, status='pending'
+    ).annotate(
+        comment_count=Count('comments', filter=Q(comments__is_active=True))
+    ).filter(
+        Q(views_count__gt=0) | Q(likes_count__gt=0) | Q(comment_count__gt=0)
+    ).values_list('id', 'created_at', 'views_count', 'likes_count', 'comment_count').iterator():
+        activity = (
+            views * ACTIVITY_WEIGHTS['views_count'] +
+            likes * ACTIVITY_WEIGHTS['likes_count'] +
+            comments * ACTIVITY_WEIGHTS['comments']
+        )
+        score = activity * 2 ** ((created_at - now).total_seconds() / half_life)
+        if score >= PRUNE_BELOW_SCORE:
+            scores[str(prediction_id)] = score
+
+    redis = get_redis_connection('default')
+    staging_key = f"{TRENDING_KEY}:rebuild"
+    redis.delete(staging_key)
+    if scores:
+        redis.zadd(staging_key, scores)
+
+    pipe = redis.pipeline()
+    if scores:
+        pipe.rename(staging_key, TRENDING_KEY)
+    else:
+        pipe.delete(TRENDING_KEY)
+    pipe.set(TRENDING_EPOCH_KEY, now.timestamp())
+    pipe.execute()
+
+    logger.info(f"Rebuilt trending index with {len(scores)} predictions")
+    return len(scores)
+
+
+def top(limit=5):
+    """Top trending predictions, best first, with market and user loaded"""
+    from charts.models import ChartPrediction
+
+    redis = get_redis_connection('default')
+    if not redis.exists(TRENDING_EPOCH_KEY):
+        rebuild()
+
+    # Over-fetch a little in case some entries went stale since they were scored
+    members = [uuid.UUID(member.decode()) for member in redis.zrevrange(TRENDING_KEY, 0, limit * 2 - 1)]
+    predictions = ChartPrediction.objects.select_related('market', 'user').in_bulk(members)
+
+    trending = []
+    stale = []
+    for member in members:
+        prediction = predictions.get(member)
+        if prediction is None or not prediction.is_public or prediction.status != 'pending':
+            stale.append(member)
+            continue
+        if len(trending) < limit:
+            trending.append(prediction)
+
+    remove(stale)
+    return trending
@@ -24,6 +24,10 @@ urlpatterns = [
     path('data/<str:symbol>/', views.chart_data_api, name='api_chart_data'),
     path('predictions/create/', views.create_prediction_api, name='api_create_prediction'),
     path('predictions/<uuid:prediction_id>/', views.prediction_detail_api, name='api_prediction_detail'),
+    path('predictions/<uuid:prediction_id>/like/', views.prediction_like_api, name='api_prediction_like'),
+    path('predictions/liked/', views.liked_predictions_api, name='api_liked_predictions'),
+    path('predictions/<uuid:prediction_id>/comments/', views.prediction_comments_api, name='api_prediction_comments'),
     path('predictions/recent/', views.recent_predictions_api, name='api_recent_predictions'),
     path('leaderboard/', views.leaderboard_api, name='api_leaderboard'),
+    path('contests/<int:contest_id>/standings/', views.contest_standings_api, name='api_contest_standings'),
 ]
@@ -3,31 +3,38 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.http import JsonResponse
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import api_view, permission_classes
-from .models import Market, StockData, ChartPrediction, Contest
+from .models import Market, StockData, ChartPrediction, ChartComment, Contest, ContestParticipation
+from users.models import UserStats
+from .leaderboard import Leaderboard, PERIODS
+from .contests import ContestStandings
+from .site_stats import get_site_stats
+from .comments import create_comment, load_comment_threads
+from .pagination import keyset_page_for_request
+from . import counters, likes, trending
 import json
 import random
+import uuid
 from datetime import datetime, timedelta
 from decimal import Decimal
 
 User = get_user_model()
 
+RANKINGS_PAGE_SIZE = 50
+LEADERBOARD_MAX_PAGE_SIZE = 100
+LIKED_LOOKUP_MAX_IDS = 100
+
 def home_view(request):
     """Home page with trending predictions and top performers"""
-    trending_predictions = ChartPrediction.objects.filter(
-        is_public=True,
-        status='pending'
-    ).select_related('market', 'user').order_by('-views_count')[:5]
+    stats = get_site_stats()
     
-    top_performers = User.objects.filter(
-        total_predictions__gt=0
-    ).order_by('-total_accuracy_rate')[:5]
+    top_performers = Leaderboard().cached_page(1, 5)
     
     current_contests = Contest.objects.filter(
         is_active=True,
@@ -35,15 +42,15 @@ def home_view(request):
         end_date__gte=timezone.now()
     )[:2]
     
-    # Sample stats (in production, calculate from database)
+    average_accuracy = stats['average_accuracy']
     context = {
-        'trending_predictions': trending_predictions,
+        'trending_predictions': stats['trending_predictions'],
         'top_performers': top_performers,
         'current_contests': current_contests,
-        'total_users': User.objects.count(),
-        'total_predictions': ChartPrediction.objects.count(),
-        'total_rewards': '100,000+',  # Calculate from payments
-        'accuracy_rate': '78%',  # Calculate average accuracy
+        'total_users': f"{stats['total_users']:,}",
+        'total_predictions': f"{stats['total_predictions']:,}",
+        'total_rewards': f"{stats['total_rewards']:,.0f}",
+        'average_accuracy': f"{average_accuracy:.0f}%" if average_accuracy is not None else None,
     }
     
     return render(request, 'home.html', context)
@@ -62,15 +69,16 @@ def chart_detail_view(request, symbol):
     ).order_by('-timestamp')[:100]
     
     # Get recent predictions for this market
-    recent_predictions = ChartPrediction.objects.filter(
+    recent_predictions = keyset_page_for_request(request, ChartPrediction.objects.filter(
         market=market,
         is_public=True
-    ).select_related('user').order_by('-created_at')[:10]
+    ).select_related('user'), default_page_size=10)
     
     context = {
         'market': market,
         'stock_data': stock_data,
-        'recent_predictions': recent_predictions,
+        'recent_predictions': recent_predictions.items,
+        'next_cursor': recent_predictions.next_cursor,
     }
     
     return render(request, 'charts/chart_detail.html', context)
@@ -80,30 +88,59 @@ def predictions_view(request):
     """User's predictions page"""
     user_predictions = ChartPrediction.objects.filter(
         user=request.user
-    ).select_related('market').order_by('-created_at')
+    ).select_related('market')
+    predictions_page = keyset_page_for_request(request, user_predictions)
     
-    # Calculate user stats
-    total_predictions = user_predictions.count()
-    correct_predictions = user_predictions.filter(status='correct').count()
-    accuracy_rate = (correct_predictions / total_predictions * 100) if total_predictions > 0 else 0
+    stats = UserStats.for_user(request.user)
     
     context = {
-        'predictions': user_predictions,
-        'total_predictions': total_predictions,
-        'correct_predictions': correct_predictions,
-        'accuracy_rate': round(accuracy_rate, 2),
+        'predictions': predictions_page.items,
+        'next_cursor': predictions_page.next_cursor,
+        'stats': stats,
+        'total_predictions': stats.created_predictions,
+        'completed_predictions': stats.completed_predictions,
+        'accuracy_rate': round(stats.accuracy_rate, 2),
     }
     
     return render(request, 'charts/predictions.html', context)
 
+def _leaderboard_for_request(request):
+    """Pick the board from ?period=all|weekly|monthly and ?market=<symbol>"""
+    period = request.GET.get('period', 'all')
+    if period not in PERIODS:
+        period = 'all'
+    
+    market = None
+    symbol = request.GET.get('market')
+    if symbol:
+        market = Market.objects.filter(symbol=symbol.upper()).first()
+    
+    return Leaderboard(period=period, market_id=market.id if market else None), market
+
+def _page_number(request):
+    try:
+        return max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return 1
+
 def rankings_view(request):
     """Global rankings page"""
-    top_users = User.objects.filter(
-        total_predictions__gt=0
-    ).order_by('-total_accuracy_rate')[:50]
+    leaderboard, market = _leaderboard_for_request(request)
+    page = _page_number(request)
+    entries = leaderboard.cached_page(page, RANKINGS_PAGE_SIZE)
+    
+    my_rank = None
+    if request.user.is_authenticated:
+        my_rank = leaderboard.rank(request.user.id)
     
     context = {
-        'top_users': top_users,
+        'leaderboard': entries,
+        'top_users': [entry['user'] for entry in entries],
+        'my_rank': my_rank,
+        'period': leaderboard.period,
+        'market': market,
+        'page': page,
+        'total_ranked': leaderboard.count(),
     }
     
     return render(request, 'charts/rankings.html', context)
@@ -257,17 +294,19 @@ def create_prediction_api(request):
         # Calculate duration in days
         duration_days = (target_date_obj - timezone.now().date()).days
         
-        prediction = ChartPrediction.objects.create(
-            user=request.user,
-            market=market,
-            target_date=target_datetime,
-            current_price=current_price,
-            predicted_price=Decimal(str(predicted_price)),
-            duration_days=duration_days,
-            confidence_level=int(confidence_level),
-            notes=notes,
-            is_public=is_public
-        )
+        with transaction.atomic():
+            prediction = ChartPrediction.objects.create(
+                user=request.user,
+                market=market,
+                target_date=target_datetime,
+                current_price=current_price,
+                predicted_price=Decimal(str(predicted_price)),
+                duration_days=duration_days,
+                confidence_level=int(confidence_level),
+                notes=notes,
+                is_public=is_public
+            )
+            UserStats.record_prediction_created(request.user.id)
         
         return JsonResponse({
             'success': True,
@@ -285,8 +324,11 @@ def create_prediction_api(request):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def recent_predictions_api(request):
-    """API endpoint to get recent predictions"""
-    predictions = ChartPrediction.objects.all().select_related('market', 'user').order_by('-created_at')[:10]
+    """API endpoint to get recent predictions, paged with ?cursor="""
+    predictions_page = keyset_page_for_request(request, ChartPrediction.objects.filter(
+        is_public=True
+    ).select_related('market', 'user'), default_page_size=10)
+    predictions = likes.annotate_likes(predictions_page.items, request.user)
     
     predictions_data = []
     for prediction in predictions:
@@ -301,14 +343,20 @@ def recent_predictions_api(request):
         predictions_data.append({
             'id': prediction.id,
             'market_symbol': prediction.market.symbol,
-            'prediction_type': prediction.prediction_type,
-            'target_price': str(prediction.target_price),
+            'direction': 'up' if prediction.predicted_price >= prediction.current_price else 'down',
+            'predicted_price': str(prediction.predicted_price),
+            'target_date': prediction.target_date.isoformat(),
             'status': prediction.status,
             'time_ago': time_ago,
-            'user': prediction.user.username
+            'user': prediction.user.username,
+            'likes_count': prediction.likes_count,
+            'liked': prediction.liked
         })
     
-    return JsonResponse({'predictions': predictions_data})
+    return JsonResponse({
+        'predictions': predictions_data,
+        'next_cursor': predictions_page.next_cursor,
+    })
 
 @csrf_exempt
 @api_view(['GET', 'DELETE'])
@@ -316,12 +364,16 @@ def recent_predictions_api(request):
 def prediction_detail_api(request, prediction_id):
     """API endpoint to get or delete a specific prediction"""
     try:
-        prediction = ChartPrediction.objects.select_related('market', 'user').get(
-            id=prediction_id,
-            user=request.user
-        )
-        
         if request.method == 'GET':
+            # Public predictions are viewable by anyone; views by others are counted
+            prediction = ChartPrediction.objects.select_related('market', 'user').get(
+                models.Q(user=request.user) | models.Q(is_public=True),
+                id=prediction_id
+            )
+            if prediction.user_id != request.user.id:
+                counters.increment(prediction.id, 'views_count')
+            counters.with_pending_counts([prediction])
+            
             return JsonResponse({
                 'id': str(prediction.id),
                 'market': {
@@ -337,12 +389,18 @@ def prediction_detail_api(request, prediction_id):
                 'status': prediction.status,
                 'notes': prediction.notes,
                 'accuracy_percentage': prediction.accuracy_percentage,
+                'views_count': prediction.views_count,
+                'likes_count': prediction.likes_count,
                 'created_at': prediction.created_at.isoformat()
             })
         
         elif request.method == 'DELETE':
+            prediction = ChartPrediction.objects.get(id=prediction_id, user=request.user)
             if prediction.status == 'pending':
-                prediction.delete()
+                with transaction.atomic():
+                    prediction.delete()
+                    UserStats.record_prediction_deleted(request.user.id, was_pending=True)
+                trending.remove([prediction_id])
                 return JsonResponse({'success': True, 'message': 'Prediction deleted successfully'})
             else:
                 return JsonResponse({'success': False, 'message': 'Cannot delete completed prediction'})
@@ -352,24 +410,186 @@ def prediction_detail_api(request, prediction_id):
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
 
+@csrf_exempt
+@api_view(['POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def prediction_like_api(request, prediction_id):
+    """API endpoint to like (POST) or unlike (DELETE) a prediction; repeating either is a no-op"""
+    prediction = get_object_or_404(
+        ChartPrediction.objects.filter(models.Q(is_public=True) | models.Q(user=request.user)),
+        id=prediction_id
+    )
+    
+    if request.method == 'POST':
+        changed = likes.like(prediction, request.user)
+    else:
+        changed = likes.unlike(prediction, request.user)
+    
+    counters.with_pending_counts([prediction])
+    return JsonResponse({
+        'success': True,
+        'liked': request.method == 'POST',
+        'changed': changed,
+        'likes_count': prediction.likes_count
+    })
+
+@csrf_exempt
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def liked_predictions_api(request):
+    """API endpoint to check which of ?ids=<uuid>,<uuid>... the user has liked"""
+    prediction_ids = []
+    for value in request.GET.get('ids', '').split(',')[:LIKED_LOOKUP_MAX_IDS]:
+        try:
+            prediction_ids.append(uuid.UUID(value.strip()))
+        except ValueError:
+            continue
+    
+    liked = likes.liked_prediction_ids(request.user, prediction_ids)
+    return JsonResponse({'liked': [str(prediction_id) for prediction_id in liked]})
+
+@csrf_exempt
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+def prediction_comments_api(request, prediction_id):
+    """API endpoint to list a prediction's comment threads or add a comment"""
+    visible = models.Q(is_public=True)
+    if request.user.is_authenticated:
+        visible |= models.Q(user=request.user)
+    prediction = get_object_or_404(ChartPrediction.objects.filter(visible), id=prediction_id)
+    
+    if request.method == 'POST':
+        if not request.user.is_authenticated:
+            return JsonResponse({'success': False, 'message': 'Authentication required'}, status=401)
+        
+        try:
+            data = json.loads(request.body) if request.body else {}
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'Invalid JSON'}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({'success': False, 'message': 'Expected a JSON object'}, status=400)
+        
+        content = data.get('content') or ''
+        if not isinstance(content, str) or not content.strip():
+            return JsonResponse({'success': False, 'message': 'Comment cannot be empty'}, status=400)
+        
+        parent_id = data.get('parent_id')
+        if parent_id is not None:
+            try:
+                if isinstance(parent_id, bool):
+                    raise ValueError
+                parent_id = int(parent_id)
+            except (TypeError, ValueError):
+                return JsonResponse({'success': False, 'message': 'parent_id must be a comment id'}, status=400)
+        
+        try:
+            comment = create_comment(prediction, request.user, content.strip(), parent_id)
+        except ChartComment.DoesNotExist:
+            return JsonResponse({'success': False, 'message': 'Parent comment not found'}, status=404)
+        
+        return JsonResponse({
+            'success': True,
+            'comment': {
+                'id': comment.id,
+                'parent_id': comment.parent_comment_id,
+                'content': comment.content,
+                'created_at': comment.created_at.isoformat()
+            }
+        }, status=201)
+    
+    threads, page_obj = load_comment_threads(prediction, _page_number(request))
+    
+    return JsonResponse({
+        'threads': threads,
+        'page': page_obj.number,
+        'num_pages': page_obj.paginator.num_pages,
+        'total_threads': page_obj.paginator.count,
+    })
+
 @csrf_exempt
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def leaderboard_api(request):
     """API endpoint to get leaderboard"""
-    top_users = User.objects.filter(
-        total_predictions__gt=0
-    ).order_by('-total_accuracy_rate')[:10]
+    leaderboard, market = _leaderboard_for_request(request)
+    page = _page_number(request)
+    try:
+        page_size = min(max(int(request.GET.get('page_size', 10)), 1), LEADERBOARD_MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = 10
     
     users_data = []
-    for user in top_users:
+    for entry in leaderboard.cached_page(page, page_size):
         users_data.append({
-            'username': user.username,
-            'accuracy': round(user.total_accuracy_rate, 1) if user.total_accuracy_rate else 0,
-            'total_predictions': user.total_predictions
+            'rank': entry['rank'],
+            'username': entry['user'].username,
+            'score': entry['score'],
+            'accuracy': entry['accuracy'],
+            'total_predictions': entry['total_predictions']
         })
     
-    return JsonResponse({'users': users_data})
+    response = {
+        'users': users_data,
+        'period': leaderboard.period,
+        'market': market.symbol if market else None,
+        'page': page,
+        'total_ranked': leaderboard.count(),
+    }
+    if request.user.is_authenticated:
+        response['my_rank'] = leaderboard.rank(request.user.id)
+    
+    return JsonResponse(response)
+
+@csrf_exempt
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def contest_standings_api(request, contest_id):
+    """API endpoint to get a contest's standings"""
+    contest = get_object_or_404(Contest, id=contest_id)
+    page = _page_number(request)
+    try:
+        page_size = min(max(int(request.GET.get('page_size', 50)), 1), LEADERBOARD_MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = 50
+    
+    standings = ContestStandings(contest.id)
+    total_ranked = standings.count()
+    if total_ranked or not contest.standings_finalized_at:
+        entries = standings.page(page, page_size)
+        my_rank = standings.rank(request.user.id) if request.user.is_authenticated else None
+    else:
+        # Live set expired after the contest ended; serve the snapshot
+        ranked = ContestParticipation.objects.filter(
+            contest=contest, rank__isnull=False
+        ).select_related('user').order_by('rank', 'id')
+        total_ranked = ranked.count()
+        start = (page - 1) * page_size
+        entries = [
+            {'rank': p.rank, 'user': p.user, 'final_accuracy': round(p.final_accuracy, 2)}
+            for p in ranked[start:start + page_size]
+        ]
+        my_rank = None
+        if request.user.is_authenticated:
+            my_rank = ranked.filter(user=request.user).values_list('rank', flat=True).first()
+    
+    response = {
+        'contest': contest.title,
+        'is_final': contest.standings_finalized_at is not None,
+        'standings': [
+            {
+                'rank': entry['rank'],
+                'username': entry['user'].username,
+                'final_accuracy': entry['final_accuracy']
+            }
+            for entry in entries
+        ],
+        'page': page,
+        'total_ranked': total_ranked,
+    }
+    if request.user.is_authenticated:
+        response['my_rank'] = my_rank
+    
+    return JsonResponse(response)
 
 # External Data Integration Functions
 
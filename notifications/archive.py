@@ -0,0 +1,64 @@
+"""
+Archival of old notifications.
+
+Read notifications older than NOTIFICATION_ARCHIVE_AFTER_DAYS, along with
+notifications that were folded into a digest or given up on, are copied into the compact
+NotificationArchive table and deleted from the live table in batches, each
+batch in its own short transaction. Rows are taken in id order, so digested
+notifications always leave before the digest that points at them.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta
+
+ARCHIVE_BATCH_SIZE = 1000
+
+ARCHIVED_FIELDS = (
+    'id', 'user_id', 'title', 'message', 'notification_type', 'category', 'priority',
+    'metadata', 'created_at', 'sent_at', 'read_at',
+)
+
+
+def archivable_notifications(now=None):
+    from notifications.models import Notification
+
+    cutoff = (now or timezone.now()) - timedelta(days=settings.NOTIFICATION_ARCHIVE_AFTER_DAYS)
+    return Notification.objects.filter(
+        Q(is_sent=True, is_read=True) | Q(is_sent=True, digest__isnull=False) | Q(failed_at__isnull=False),
+        created_at__lt=cutoff
+    )
+
+
+def archive_batch(ids):
+    """Copy these notifications into the archive and delete them; returns rows archived"""
+    from notifications.models import Notification, NotificationArchive
+
+    with transaction.atomic():
+        rows = Notification.objects.filter(id__in=ids).values(*ARCHIVED_FIELDS)
+        NotificationArchive.objects.bulk_create(
+            [NotificationArchive(original_id=row.pop('id'), **row) for row in rows],
+            ignore_conflicts=True
+        )
+        _, deleted = Notification.objects.filter(id__in=ids).delete()
+    return deleted.get(Notification._meta.label, 0)
+
+
+def archive_notifications(batch_size=ARCHIVE_BATCH_SIZE, max_batches=None, now=None):
+    """Archive eligible notifications in batches; returns how many were moved"""
+    now = now or timezone.now()
+    archived = 0
+    batches = 0
+    last_id = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(archivable_notifications(now).filter(
+            id__gt=last_id
+        ).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+
+        archived += archive_batch(ids)
+        last_id = ids[-1]
+        batches += 1
+    return archived
@@ -0,0 +1,104 @@
+"""
+Delivery channel backends.
+
+A backend is opened once per dispatcher run (connections may be deferred to
+the first send) and sends one notification per send() call, raising on
+failure: PermanentDeliveryError when retrying can't help, anything else for
+transient errors. NOTIFICATION_CHANNEL_BACKENDS maps each channel to its
+backend class; push and SMS default to local stand-ins that only log until
+real providers are wired in.
+"""
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils.module_loading import import_string
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentDeliveryError(Exception):
+    """The notification can never be delivered on this channel, e.g. no address"""
+
+
+class BaseChannel:
+    """Interface every channel backend implements"""
+    name = None
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, notification):
+        raise NotImplementedError
+
+
+class EmailChannel(BaseChannel):
+    """
+    Email over a single mail connection reused for the whole run, opened on
+    the first send so runs with nothing to deliver never log in
+    """
+    name = 'email'
+
+    def open(self):
+        self.connection = None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def send(self, notification):
+        if not notification.user.email:
+            raise PermanentDeliveryError("User has no email address")
+        if self.connection is None:
+            self.connection = get_connection(fail_silently=False)
+            self.connection.open()
+        # One message per call so a bad address only fails its own notification
+        self.connection.send_messages([EmailMessage(
+            subject=notification.title,
+            body=notification.message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[notification.user.email],
+            connection=self.connection,
+        )])
+
+
+class InAppChannel(BaseChannel):
+    """The notification row is the in-app message; delivering it is a no-op"""
+    name = 'in_app'
+
+    def send(self, notification):
+        pass
+
+
+class LocalPushChannel(BaseChannel):
+    """Stand-in push backend that logs instead of calling a push provider"""
+    name = 'push'
+
+    def send(self, notification):
+        logger.info(f"[push] to user {notification.user_id}: {notification.title}")
+
+
+class LocalSMSChannel(BaseChannel):
+    """Stand-in SMS backend that logs instead of calling an SMS gateway"""
+    name = 'sms'
+
+    def send(self, notification):
+        logger.info(f"[sms] to user {notification.user_id}: {notification.title}")
+
+
+def load_channels():
+    """Instantiate the configured backend of every enabled channel"""
+    enabled = {
+        'email': settings.EMAIL_NOTIFICATION_ENABLED,
+        'push': settings.PUSH_NOTIFICATION_ENABLED,
+        'sms': settings.SMS_NOTIFICATION_ENABLED,
+        'in_app': True,
+    }
+    return {
+        channel: import_string(path)()
+        for channel, path in settings.NOTIFICATION_CHANNEL_BACKENDS.items()
+        if enabled.get(channel, True)
+    }
@@ -0,0 +1,94 @@
+"""
+Digests for low and medium priority notifications.
+
+Digestible notifications are held until the end of the digest window they
+are scheduled in (see dispatch.create_notifications(), which every producer
+goes through), so everything a user receives in one window comes due
+together. When the dispatcher claims a chunk, the rows sharing a user, type
+and category are folded into one digest notification, rendered from the
+notification_digest template, and only the digest is delivered. The originals are marked sent and point at their
+digest, so they never go out on their own.
+"""
+from django.conf import settings
+from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+PRIORITY_ORDER = ('low', 'medium', 'high', 'urgent')
+
+
+def is_digestible(priority):
+    return priority in settings.NOTIFICATION_DIGEST_PRIORITIES
+
+
+def digest_window_end(now=None):
+    """End of the digest window containing `now`; windows are aligned to the epoch"""
+    now = now or timezone.now()
+    window = settings.NOTIFICATION_DIGEST_WINDOW_MINUTES * 60
+    if window <= 0:
+        return now
+    epoch = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    elapsed = (now - epoch).total_seconds()
+    return epoch + timedelta(seconds=(elapsed // window + 1) * window)
+
+
+def coalesce(notifications, token):
+    """
+    Fold the claimed digestible notifications of each (user, type, category)
+    into one digest claimed by the same run. Returns the chunk to deliver:
+    the untouched notifications plus the new digests.
+    """
+    from notifications.models import Notification
+    from notifications.templating import render_many
+
+    groups = {}
+    keep = []
+    for notification in notifications:
+        if is_digestible(notification.priority) and not notification.metadata.get('digest_of'):
+            key = (notification.user_id, notification.notification_type, notification.category)
+            groups.setdefault(key, []).append(notification)
+        else:
+            keep.append(notification)
+
+    folded = []
+    for group in groups.values():
+        if len(group) < 2:
+            keep.extend(group)
+        else:
+            folded.append(group)
+    if not folded:
+        return notifications
+
+    rendered = render_many('notification_digest', [
+        (group[0].user.preferred_language, {'user': group[0].user, 'notifications': group})
+        for group in folded
+    ])
+
+    now = timezone.now()
+    digests = Notification.objects.bulk_create([
+        Notification(
+            user=group[0].user,
+            title=subject,
+            message=message,
+            notification_type=group[0].notification_type,
+            category=group[0].category,
+            priority=max((notification.priority for notification in group), key=PRIORITY_ORDER.index),
+            scheduled_at=now,
+            claim_token=token,
+            claimed_until=max(notification.claimed_until for notification in group),
+            metadata={'digest_of': [notification.id for notification in group]}
+        )
+        for group, (subject, message) in zip(folded, rendered)
+    ])
+
+    for digest, group in zip(digests, folded):
+        Notification.objects.filter(
+            id__in=[notification.id for notification in group], claim_token=token
+        ).update(
+            digest=digest,
+            is_sent=True,
+            sent_at=now,
+            claim_token=None,
+            claimed_until=None
+        )
+
+    return keep + digests
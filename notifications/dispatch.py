@@ -0,0 +1,308 @@
+"""
+Batched dispatch of pending notifications.
+
+Due notifications are claimed in chunks: a claim stamps the rows with the
+run's claim_token and a lease (claimed_until), so concurrent dispatchers
+never pick up the same row. On PostgreSQL candidates are locked with
+SELECT ... FOR UPDATE SKIP LOCKED so workers don't queue behind each other;
+elsewhere a compare-and-set UPDATE decides who wins each row. Each chunk is
+routed to its channels by user preference (see routing.py), delivered
+through backends opened once per run, and recorded in NotificationDelivery
+and on the notifications with one statement each.
+
+Leases are renewed while a chunk is being sent, so a slow chunk is never
+picked up by a second run. A notification with a failed channel keeps its
+lease until it expires, which doubles as a retry delay; so does one claimed
+by a worker that died. Retries skip the channels that already delivered it,
+or that rejected it for good (PermanentDeliveryError). After
+NOTIFICATION_MAX_ATTEMPTS failed attempts the notification is stamped
+failed_at and left alone.
+
+Each priority is dispatched by its own task on its own Celery queue, so a
+large low priority send never sits in front of an urgent one. Urgent and
+high priority notifications also kick their queue as soon as they are
+created instead of waiting for the next scheduled run; low and medium ones
+are folded into per-user digests before delivery (see digests.py).
+"""
+from django.conf import settings
+from django.db import connection as db_connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from datetime import timedelta
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_CHUNK_SIZE = 500
+CLAIM_LEASE_SECONDS = 300
+
+PRIORITY_QUEUES = {
+    'urgent': 'notifications.urgent',
+    'high': 'notifications.high',
+    'medium': 'notifications.medium',
+    'low': 'notifications.low',
+}
+IMMEDIATE_PRIORITIES = ('urgent', 'high')
+
+
+def claimable_notifications(now=None, priority=None):
+    """Due, unsent notifications not leased by another run, oldest first"""
+    from notifications.models import Notification
+
+    now = now or timezone.now()
+    notifications = Notification.objects.filter(
+        Q(claimed_until__isnull=True) | Q(claimed_until__lt=now),
+        is_sent=False,
+        failed_at__isnull=True,
+        scheduled_at__lte=now
+    )
+    if priority:
+        notifications = notifications.filter(priority=priority)
+    return notifications.order_by('scheduled_at', 'id')
+
+
+def claim_chunk(queryset, token, chunk_size=DISPATCH_CHUNK_SIZE, lease_seconds=CLAIM_LEASE_SECONDS):
+    """
+    Lease up to chunk_size rows of queryset to `token` and return them with
+    their users loaded. Rows leased by anyone else are never returned.
+    """
+    from notifications.models import Notification
+
+    now = timezone.now()
+    lease = {'claim_token': token, 'claimed_until': now + timedelta(seconds=lease_seconds)}
+
+    with transaction.atomic():
+        candidates = queryset
+        if db_connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        candidate_ids = list(candidates.values_list('id', flat=True)[:chunk_size])
+
+        # Compare-and-set: only rows still unleased are taken, so without row
+        # locks a concurrent run simply loses the rows it didn't get first
+        Notification.objects.filter(
+            Q(claimed_until__isnull=True) | Q(claimed_until__lt=now),
+            id__in=candidate_ids,
+            is_sent=False
+        ).update(**lease)
+
+    return list(Notification.objects.filter(
+        id__in=candidate_ids, claim_token=token
+    ).select_related('user').order_by('scheduled_at', 'id'))
+
+
+def extend_lease(notification_ids, token, lease_seconds=CLAIM_LEASE_SECONDS):
+    """Push back the lease on the given rows still held by `token`; returns the ids still held"""
+    from notifications.models import Notification
+
+    held = Notification.objects.filter(id__in=notification_ids, claim_token=token)
+    held.update(claimed_until=timezone.now() + timedelta(seconds=lease_seconds))
+    return set(held.values_list('id', flat=True))
+
+
+def deliver_chunk(notifications, channels, token, lease_seconds=CLAIM_LEASE_SECONDS):
+    """
+    Deliver one claimed chunk on every channel it routes to and record the
+    outcome; returns (delivered, failed) counted per notification.
+
+    Sending a chunk can outlast the lease, so it is renewed every third of
+    the lease for the notifications not yet sent; any that another run has
+    taken over by then are skipped and left to it.
+    """
+    from notifications.models import Notification, NotificationDelivery
+    from notifications.channels import PermanentDeliveryError
+    from notifications.inbox import record_delivered
+    from notifications.routing import route
+
+    routes = route(notifications)
+    already_done = set(NotificationDelivery.objects.filter(
+        notification_id__in=list(routes), status__in=('sent', 'rejected')
+    ).values_list('notification_id', 'channel'))
+
+    now = timezone.now()
+    deliveries = []
+    delivered = []
+    retry_ids = []
+    lease_renewed_at = time.monotonic()
+    leased_ids = {notification.id for notification in notifications}
+    for position, notification in enumerate(notifications):
+        if time.monotonic() - lease_renewed_at >= lease_seconds / 3:
+            leased_ids = extend_lease([n.id for n in notifications[position:]], token, lease_seconds)
+            lease_renewed_at = time.monotonic()
+        if notification.id not in leased_ids:
+            continue
+
+        ok = True
+        for channel in routes[notification.id]:
+            backend = channels.get(channel)
+            if backend is None or (notification.id, channel) in already_done:
+                continue
+            try:
+                backend.send(notification)
+            except PermanentDeliveryError as e:
+                # Retrying can't help; the other channels decide the outcome
+                logger.warning(f"Notification {notification.id} rejected by {channel}: {str(e)}")
+                deliveries.append(NotificationDelivery(
+                    notification=notification, channel=channel, status='rejected',
+                    error=str(e), attempted_at=now
+                ))
+                continue
+            except Exception as e:
+                logger.error(f"Error sending notification {notification.id} via {channel}: {str(e)}")
+                deliveries.append(NotificationDelivery(
+                    notification=notification, channel=channel, status='failed',
+                    error=str(e), attempted_at=now
+                ))
+                ok = False
+                continue
+            deliveries.append(NotificationDelivery(
+                notification=notification, channel=channel, status='sent', attempted_at=now
+            ))
+
+        if ok:
+            delivered.append(notification)
+        else:
+            retry_ids.append(notification.id)
+
+    with transaction.atomic():
+        NotificationDelivery.objects.bulk_create(
+            deliveries,
+            update_conflicts=True,
+            unique_fields=['notification', 'channel'],
+            update_fields=['status', 'error', 'attempted_at']
+        )
+        # Only rows this run still holds are marked sent; one whose lease ran
+        # out may have been reclaimed, and counted, by another run
+        held = Notification.objects.filter(
+            id__in=[notification.id for notification in delivered], claim_token=token
+        )
+        if db_connection.features.has_select_for_update:
+            held = held.select_for_update()
+        held_ids = set(held.values_list('id', flat=True))
+        Notification.objects.filter(id__in=held_ids, claim_token=token).update(
+            is_sent=True,
+            sent_at=now,
+            claim_token=None,
+            claimed_until=None
+        )
+        # Failed notifications keep their lease as the retry delay, until they run out of attempts
+        Notification.objects.filter(id__in=retry_ids, claim_token=token).update(attempts=F('attempts') + 1)
+        gave_up = Notification.objects.filter(
+            id__in=retry_ids, claim_token=token, attempts__gte=settings.NOTIFICATION_MAX_ATTEMPTS
+        ).update(failed_at=now, claim_token=None, claimed_until=None)
+    if gave_up:
+        logger.error(f"Gave up on {gave_up} notifications after {settings.NOTIFICATION_MAX_ATTEMPTS} attempts")
+    # Delivered notifications land in the in-app inbox unread
+    delivered = [notification for notification in delivered if notification.id in held_ids]
+    record_delivered(delivered)
+    return len(delivered), len(retry_ids)
+
+
+def dispatch_pending_notifications(chunk_size=DISPATCH_CHUNK_SIZE, priority=None, max_messages=None):
+    """
+    Claim and deliver due notifications, of one priority if given, until
+    none are left or max_messages have been attempted. Safe to run in
+    several workers at once.
+    """
+    from notifications.channels import load_channels
+    from notifications.digests import coalesce, is_digestible
+
+    token = uuid.uuid4()
+    total_sent = 0
+    total_failed = 0
+
+    channels = load_channels()
+    opened = []
+    try:
+        for backend in channels.values():
+            backend.open()
+            opened.append(backend)
+
+        while True:
+            limit = chunk_size
+            if max_messages:
+                limit = min(chunk_size, max_messages - total_sent - total_failed)
+                if limit <= 0:
+                    break
+
+            chunk = claim_chunk(claimable_notifications(priority=priority), token, limit)
+            if not chunk:
+                # Another run may have won every candidate; stop only once nothing is claimable
+                if not claimable_notifications(priority=priority).exists():
+                    break
+                continue
+
+            if priority is None or is_digestible(priority):
+                chunk = coalesce(chunk, token)
+            sent, failed = deliver_chunk(chunk, channels, token)
+            total_sent += sent
+            total_failed += failed
+    finally:
+        for backend in opened:
+            backend.close()
+
+    if total_sent or total_failed:
+        logger.info(f"Delivered {total_sent} {priority or 'all'} priority notifications, {total_failed} failed")
+    return total_sent, total_failed
+
+
+def send_limit(priority):
+    """Notifications one scheduled run may send for this priority; None means no limit"""
+    return settings.NOTIFICATION_SEND_LIMITS.get(priority) or None
+
+
+def queue_dispatch(priority):
+    """Ask a worker on the priority's queue to dispatch it now; the scheduled run is the fallback"""
+    from notifications.tasks import send_pending_notifications
+
+    try:
+        send_pending_notifications.apply_async(
+            kwargs={'priority': priority},
+            queue=PRIORITY_QUEUES[priority]
+        )
+    except Exception as e:
+        logger.error(f"Error queueing {priority} notification dispatch: {str(e)}")
+
+
+def create_notifications(notifications):
+    """
+    Save unsaved Notification instances in one statement. Every producer goes
+    through here (or create_notification), so digestible notifications are
+    held until the end of the digest window they are scheduled in, and urgent
+    and high priority notifications that are already due get their queue
+    kicked, once per priority, as soon as the surrounding transaction commits.
+    """
+    from notifications.models import Notification
+    from notifications.digests import digest_window_end, is_digestible
+
+    for notification in notifications:
+        if is_digestible(notification.priority):
+            notification.scheduled_at = digest_window_end(notification.scheduled_at)
+    notifications = Notification.objects.bulk_create(notifications)
+
+    now = timezone.now()
+    due_priorities = {
+        notification.priority for notification in notifications
+        if notification.priority in IMMEDIATE_PRIORITIES and notification.scheduled_at <= now
+    }
+    for priority in sorted(due_priorities, key=IMMEDIATE_PRIORITIES.index):
+        transaction.on_commit(lambda priority=priority: queue_dispatch(priority))
+    return notifications
+
+
+def create_notification(user, title, message, notification_type='email', priority='medium',
+                        category='system', scheduled_at=None, metadata=None):
+    """Create a single notification; see create_notifications()"""
+    from notifications.models import Notification
+
+    return create_notifications([Notification(
+        user=user,
+        title=title,
+        message=message,
+        notification_type=notification_type,
+        priority=priority,
+        category=category,
+        scheduled_at=scheduled_at or timezone.now(),
+        metadata=metadata or {}
+    )])[0]
@@ -0,0 +1,68 @@
+"""
+In-app inbox: delivered notifications and the per-user unread count.
+
+The unread count lives in the cache and is kept current with INCR/DECR as
+notifications are delivered and read, so the navbar poll is a single cache
+GET. A missing key is recounted from the database once; counters carry a
+TTL so any drift (deleted notifications, a lost increment) heals itself.
+"""
+from django.core.cache import cache
+from django.utils import timezone
+
+UNREAD_COUNT_TTL_SECONDS = 3600
+
+
+def _unread_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def inbox(user):
+    """Notifications that have reached the user's in-app inbox; digested ones appear as their digest"""
+    from notifications.models import Notification
+
+    return Notification.objects.filter(user=user, is_sent=True, digest__isnull=True)
+
+
+def unread_count(user):
+    count = cache.get(_unread_key(user.id))
+    if count is None:
+        count = inbox(user).filter(is_read=False).count()
+        cache.add(_unread_key(user.id), count, UNREAD_COUNT_TTL_SECONDS)
+    return count
+
+
+def adjust_unread(user_id, delta):
+    """Apply a change to a cached count; a missing key is left for the next read to recount"""
+    if not delta:
+        return
+    try:
+        if cache.incr(_unread_key(user_id), delta) < 0:
+            cache.delete(_unread_key(user_id))
+    except ValueError:
+        pass
+
+
+def record_delivered(notifications):
+    """Count newly delivered notifications as unread, one INCR per user"""
+    per_user = {}
+    for notification in notifications:
+        per_user[notification.user_id] = per_user.get(notification.user_id, 0) + 1
+    for user_id, delta in per_user.items():
+        adjust_unread(user_id, delta)
+
+
+def mark_read(user, notification_ids=None):
+    """
+    Mark the given notifications (all unread ones when None) as read in a
+    single UPDATE; returns how many changed
+    """
+    notifications = inbox(user).filter(is_read=False)
+    if notification_ids is not None:
+        notifications = notifications.filter(id__in=notification_ids)
+
+    updated = notifications.update(is_read=True, read_at=timezone.now())
+    if notification_ids is None:
+        cache.set(_unread_key(user.id), 0, UNREAD_COUNT_TTL_SECONDS)
+    else:
+        adjust_unread(user.id, -updated)
+    return updated
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notification_claim'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['is_sent', 'priority', 'scheduled_at'], name='notificatio_is_sent_108f09_idx'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:23
+
+from django.db import migrations, models
+
+
+DEFAULT_TEMPLATES = [
+    {
+        'name': 'welcome',
+        'subject_template': 'Welcome to Stock Chart Prediction Platform!',
+        'message_template': """Hi {{ user.username|default:user.email }},
+
+Welcome to our Stock Chart Prediction Platform!
+
+You now have access to:
+- Real-time stock charts for multiple markets
+- AI-powered prediction tools
+- Social trading community
+- Contest participation
+
+As a new user, you have {{ user.free_visits_remaining }} free visits to explore premium features.
+
+Get started by making your first prediction!
+
+Best regards,
+Stock Chart Prediction Team""",
+    },
+    {
+        'name': 'subscription_reminder',
+        'subject_template': 'Your free visits are running low!',
+        'message_template': """Hi {{ user.username|default:user.email }},
+
+You have {{ user.free_visits_remaining }} free visit(s) remaining.
+
+Upgrade to Premium to get:
+- Unlimited chart views
+- Advanced prediction tools
+- Contest participation
+- Detailed analytics
+
+Upgrade now and continue your trading journey!
+
+Best regards,
+Stock Chart Prediction Team""",
+    },
+]
+
+
+def create_default_templates(apps, schema_editor):
+    NotificationTemplate = apps.get_model('notifications', 'NotificationTemplate')
+    for template in DEFAULT_TEMPLATES:
+        NotificationTemplate.objects.get_or_create(
+            name=template['name'],
+            language='en',
+            defaults={**template, 'notification_type': 'email'},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_notification_routing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationtemplate',
+            name='language',
+            field=models.CharField(choices=[('en', 'English'), ('ko', '한국어'), ('ja', '日本語'), ('zh', '中文'), ('de', 'Deutsch'), ('fr', 'Français'), ('es', 'Español')], default='en', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='notificationtemplate',
+            name='name',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AlterUniqueTogether(
+            name='notificationtemplate',
+            unique_together={('name', 'language')},
+        ),
+        migrations.RunPython(create_default_templates, migrations.RunPython.noop),
+    ]
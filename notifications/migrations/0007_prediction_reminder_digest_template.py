@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:26
+
+from django.db import migrations
+
+
+DIGEST_TEMPLATE = {
+    'name': 'prediction_reminder_digest',
+    'subject_template': (
+        '{% if predictions|length == 1 %}Your {{ predictions.0.market.symbol }} prediction is due soon!'
+        '{% else %}{{ predictions|length }} of your predictions are due soon!{% endif %}'
+    ),
+    'message_template': """Hi {{ user.username }},
+
+{% if predictions|length == 1 %}Your prediction is{% else %}These predictions are{% endif %} coming due:
+{% for prediction in predictions %}
+- {{ prediction.market.symbol }}, due {{ prediction.target_date|date:"Y-m-d H:i" }} UTC: predicted ${{ prediction.predicted_price }} from ${{ prediction.current_price }}{% endfor %}
+
+We'll automatically check the accuracy when the target date arrives.
+
+Best regards,
+Stock Chart Prediction Team""",
+}
+
+
+def create_digest_template(apps, schema_editor):
+    NotificationTemplate = apps.get_model('notifications', 'NotificationTemplate')
+    NotificationTemplate.objects.get_or_create(
+        name=DIGEST_TEMPLATE['name'],
+        language='en',
+        defaults={**DIGEST_TEMPLATE, 'notification_type': 'email'},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_notification_inbox_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_digest_template, migrations.RunPython.noop),
+    ]
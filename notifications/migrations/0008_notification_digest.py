@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+DIGEST_TEMPLATE = {
+    'name': 'notification_digest',
+    'subject_template': 'You have {{ notifications|length }} new notifications',
+    'message_template': """Hi {{ user.username }},
+
+Here's what happened since your last update:
+{% for notification in notifications %}
+{{ notification.title }}
+{{ notification.message }}
+{% endfor %}
+Best regards,
+Stock Chart Prediction Team""",
+}
+
+
+def create_digest_template(apps, schema_editor):
+    NotificationTemplate = apps.get_model('notifications', 'NotificationTemplate')
+    NotificationTemplate.objects.get_or_create(
+        name=DIGEST_TEMPLATE['name'],
+        language='en',
+        defaults={**DIGEST_TEMPLATE, 'notification_type': 'email'},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0007_prediction_reminder_digest_template'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='digest',
+            field=models.ForeignKey(blank=True, help_text='Digest this notification was delivered in', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='digested', to='notifications.notification'),
+        ),
+        migrations.RunPython(create_digest_template, migrations.RunPython.noop),
+    ]
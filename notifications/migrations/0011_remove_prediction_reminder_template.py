@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 05:10
+
+from django.db import migrations
+
+
+# As seeded by 0005; reminders are rendered from prediction_reminder_digest
+SEEDED_SUBJECT = 'Your {{ prediction.market.symbol }} prediction is due soon!'
+
+
+def remove_seeded_template(apps, schema_editor):
+    NotificationTemplate = apps.get_model('notifications', 'NotificationTemplate')
+    # Only the unedited seed; a template someone has changed is left alone
+    NotificationTemplate.objects.filter(
+        name='prediction_reminder',
+        language='en',
+        subject_template=SEEDED_SUBJECT,
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0010_notification_attempts'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_seeded_template, migrations.RunPython.noop),
+    ]
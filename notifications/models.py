@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -20,16 +21,29 @@ class Notification(models.Model):
         ('urgent', 'Urgent'),
     )
     
+    CATEGORIES = (
+        ('predictions', 'Predictions'),
+        ('contests', 'Contests'),
+        ('promotions', 'Promotions'),
+        ('system', 'System'),
+    )
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
     title = models.CharField(max_length=200)
     message = models.TextField()
     notification_type = models.CharField(max_length=20, choices=NOTIFICATION_TYPES)
     priority = models.CharField(max_length=10, choices=PRIORITY_LEVELS, default='medium')
+    category = models.CharField(max_length=20, choices=CATEGORIES, default='system', help_text="Selects the user's channel preferences")
     is_sent = models.BooleanField(default=False)
     is_read = models.BooleanField(default=False)
     scheduled_at = models.DateTimeField(default=timezone.now)
     sent_at = models.DateTimeField(null=True, blank=True)
     read_at = models.DateTimeField(null=True, blank=True)
+    claim_token = models.UUIDField(null=True, blank=True, help_text="Dispatcher run currently sending this notification")
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0, help_text="Failed delivery attempts")
+    failed_at = models.DateTimeField(null=True, blank=True, help_text="Set when delivery was given up on")
+    digest = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='digested', help_text="Digest this notification was delivered in")
     metadata = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -39,16 +53,80 @@ class Notification(models.Model):
     def mark_as_read(self):
         """Mark notification as read"""
         if not self.is_read:
-            self.is_read = True
-            self.read_at = timezone.now()
-            self.save()
+            from notifications.inbox import mark_read
+            if mark_read(self.user, [self.id]):
+                self.is_read = True
+                self.read_at = timezone.now()
+    
+    class Meta:
+        # No default ordering: every query orders for the index it uses
+        indexes = [
+            # Per-priority dispatch: equality on is_sent and priority, range on scheduled_at
+            models.Index(fields=['is_sent', 'priority', 'scheduled_at']),
+            # Inbox pages, keyset on (created_at, id)
+            models.Index(fields=['user', 'created_at', 'id']),
+            # Unread counts and unread-only inbox pages; covers only the few unread rows
+            models.Index(
+                fields=['user', 'created_at', 'id'],
+                condition=models.Q(is_sent=True, is_read=False, digest__isnull=True),
+                name='notification_unread_idx'
+            ),
+        ]
+
+class NotificationArchive(models.Model):
+    """Read notifications moved out of the live table, see notifications/archive.py"""
+    original_id = models.BigIntegerField(unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    category = models.CharField(max_length=20, choices=Notification.CATEGORIES)
+    priority = models.CharField(max_length=10, choices=Notification.PRIORITY_LEVELS)
+    metadata = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField()
+    sent_at = models.DateTimeField(null=True, blank=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.title} - archived"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+class NotificationDelivery(models.Model):
+    """Outcome of delivering a notification on one channel"""
+    CHANNELS = (
+        ('email', 'Email'),
+        ('push', 'Push Notification'),
+        ('sms', 'SMS'),
+        ('in_app', 'In-App Notification'),
+    )
+    
+    STATUS_CHOICES = (
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('rejected', 'Rejected'),
+    )
+    
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='deliveries')
+    channel = models.CharField(max_length=20, choices=CHANNELS)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    error = models.TextField(blank=True)
+    attempted_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.notification_id} via {self.channel}: {self.status}"
     
     class Meta:
-        ordering = ['-created_at']
+        unique_together = ('notification', 'channel')
 
 class NotificationTemplate(models.Model):
-    """Templates for different types of notifications"""
-    name = models.CharField(max_length=100, unique=True)
+    """Templates for different types of notifications, one row per language"""
+    name = models.CharField(max_length=100)
+    language = models.CharField(max_length=10, choices=settings.LANGUAGES, default='en')
     subject_template = models.CharField(max_length=200)
     message_template = models.TextField()
     notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
@@ -57,7 +135,21 @@ class NotificationTemplate(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
-        return self.name
+        return f"{self.name} ({self.language})"
+    
+    def save(self, *args, **kwargs):
+        from notifications.templating import invalidate_templates
+        super().save(*args, **kwargs)
+        invalidate_templates()
+    
+    def delete(self, *args, **kwargs):
+        from notifications.templating import invalidate_templates
+        result = super().delete(*args, **kwargs)
+        invalidate_templates()
+        return result
+    
+    class Meta:
+        unique_together = ('name', 'language')
 
 class UserNotificationSettings(models.Model):
     """User preferences for notifications"""
@@ -0,0 +1,65 @@
+"""
+Fan-out of notifications to delivery channels by user preference.
+
+Preferences for a whole chunk of notifications are resolved with a single
+query; users without a UserNotificationSettings row get the model defaults.
+Every notification is always delivered in-app. An in_app notification goes
+nowhere else; any other notification also goes to each channel the user
+has enabled for its category.
+"""
+
+# (channel, category) -> UserNotificationSettings field; pairs without a
+# toggle are never sent on that channel
+PREFERENCE_FIELDS = {
+    ('email', 'predictions'): 'email_predictions',
+    ('email', 'contests'): 'email_contests',
+    ('email', 'promotions'): 'email_promotions',
+    ('email', 'system'): 'email_system',
+    ('push', 'predictions'): 'push_predictions',
+    ('push', 'contests'): 'push_contests',
+    ('push', 'promotions'): 'push_promotions',
+}
+ROUTED_CHANNELS = ('email', 'push', 'sms')
+
+# sms_important covers urgent and high priority notifications outside promotions
+SMS_PRIORITIES = ('urgent', 'high')
+
+
+def preferences_for(user_ids):
+    """UserNotificationSettings per user id in one query, defaults for users without a row"""
+    from notifications.models import UserNotificationSettings
+
+    user_ids = set(user_ids)
+    preferences = {
+        row.user_id: row
+        for row in UserNotificationSettings.objects.filter(user_id__in=user_ids)
+    }
+    defaults = UserNotificationSettings()
+    return {user_id: preferences.get(user_id, defaults) for user_id in user_ids}
+
+
+def _wants(preferences, channel, notification):
+    if channel == 'sms':
+        return (preferences.sms_important
+                and notification.priority in SMS_PRIORITIES
+                and notification.category != 'promotions')
+
+    field = PREFERENCE_FIELDS.get((channel, notification.category))
+    return field is not None and getattr(preferences, field)
+
+
+def route(notifications):
+    """Map each notification id to the channels it should be delivered on"""
+    preferences = preferences_for(notification.user_id for notification in notifications)
+
+    routes = {}
+    for notification in notifications:
+        channels = ['in_app']
+        if notification.notification_type != 'in_app':
+            user_preferences = preferences[notification.user_id]
+            channels += [
+                channel for channel in ROUTED_CHANNELS
+                if _wants(user_preferences, channel, notification)
+            ]
+        routes[notification.id] = channels
+    return routes
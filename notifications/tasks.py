@@ -1,74 +1,48 @@
 from celery import shared_task
 from django.core.mail import send_mail
 from django.conf import settings
-from django.utils import timezone
 import logging
 
 logger = logging.getLogger(__name__)
 
 @shared_task
-def send_pending_notifications():
-    """Send pending email notifications"""
+def send_pending_notifications(priority=None):
+    """Deliver pending notifications on their channels, of a single priority if given"""
     try:
-        from notifications.models import Notification
+        from notifications.dispatch import dispatch_pending_notifications, send_limit
         
-        pending_notifications = Notification.objects.filter(
-            is_sent=False,
-            notification_type='email',
-            scheduled_at__lte=timezone.now()
-        )
-        
-        for notification in pending_notifications:
-            try:
-                send_mail(
-                    notification.title,
-                    notification.message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [notification.user.email],
-                    fail_silently=False,
-                )
-                
-                notification.is_sent = True
-                notification.sent_at = timezone.now()
-                notification.save()
-                
-                logger.info(f"Notification sent to {notification.user.email}")
-            except Exception as e:
-                logger.error(f"Error sending notification to {notification.user.email}: {str(e)}")
+        sent, failed = dispatch_pending_notifications(priority=priority, max_messages=send_limit(priority))
         
-        return f"Processed {pending_notifications.count()} notifications"
+        return f"Processed {sent + failed} {priority or 'all'} priority notifications ({failed} failed)"
     except Exception as e:
         logger.error(f"Error processing notifications: {str(e)}")
         return f"Error processing notifications: {str(e)}"
 
+@shared_task
+def archive_notifications():
+    """Move old read notifications into the archive table"""
+    try:
+        from notifications.archive import archive_notifications as archive
+        
+        archived = archive()
+        
+        logger.info(f"Archived {archived} notifications")
+        return f"Archived {archived} notifications"
+    except Exception as e:
+        logger.error(f"Error archiving notifications: {str(e)}")
+        return f"Error archiving notifications: {str(e)}"
+
 @shared_task
 def send_welcome_email(user_id):
     """Send welcome email to new users"""
     try:
         from django.contrib.auth import get_user_model
+        from notifications.templating import render
         User = get_user_model()
         
         user = User.objects.get(id=user_id)
         
-        subject = "Welcome to Stock Chart Prediction Platform!"
-        message = f"""
-        Hi {user.username or user.email},
-        
-        Welcome to our Stock Chart Prediction Platform!
-        
-        You now have access to:
-        - Real-time stock charts for multiple markets
-        - AI-powered prediction tools
-        - Social trading community
-        - Contest participation
-        
-        As a new user, you have {user.free_visits_remaining} free visits to explore premium features.
-        
-        Get started by making your first prediction!
-        
-        Best regards,
-        Stock Chart Prediction Team
-        """
+        subject, message = render('welcome', {'user': user}, user.preferred_language)
         
         send_mail(
             subject,
@@ -89,28 +63,13 @@ def send_subscription_reminder(user_id):
     """Send subscription reminder to users with low free visits"""
     try:
         from django.contrib.auth import get_user_model
+        from notifications.templating import render
         User = get_user_model()
         
         user = User.objects.get(id=user_id)
         
         if user.user_type == 'free' and user.free_visits_remaining <= 1:
-            subject = "Your free visits are running low!"
-            message = f"""
-            Hi {user.username or user.email},
-            
-            You have {user.free_visits_remaining} free visit(s) remaining.
-            
-            Upgrade to Premium to get:
-            - Unlimited chart views
-            - Advanced prediction tools
-            - Contest participation
-            - Detailed analytics
-            
-            Upgrade now and continue your trading journey!
-            
-            Best regards,
-            Stock Chart Prediction Team
-            """
+            subject, message = render('subscription_reminder', {'user': user}, user.preferred_language)
             
             send_mail(
                 subject,
@@ -0,0 +1,110 @@
+"""
+Rendering of NotificationTemplate rows.
+
+Each worker compiles every active template once and keeps the compiled
+objects in process memory. Saving or deleting a template bumps a version
+token in the shared cache; a worker that sees a new token recompiles on its
+next render, so edits reach all workers without a restart. Batch rendering
+checks the token once for the whole batch.
+
+Templates are looked up by name and language. A missing language variant
+falls back to the base language ('ko-kr' -> 'ko'), then DEFAULT_LANGUAGE,
+then English.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template import Context, Template
+import threading
+import uuid
+
+TEMPLATES_VERSION_KEY = 'notification_templates:version'
+
+_lock = threading.Lock()
+_compiled = {'version': None, 'loaded': False, 'templates': {}}
+
+
+class TemplateNotFound(LookupError):
+    pass
+
+
+class CompiledTemplate:
+    """A template's subject and message, compiled once"""
+
+    def __init__(self, template):
+        self.name = template.name
+        self.language = template.language
+        self.notification_type = template.notification_type
+        self.subject = Template(template.subject_template)
+        self.message = Template(template.message_template)
+
+    def render(self, context):
+        """Return (subject, message); plain text, so nothing is HTML-escaped"""
+        context = Context(context, autoescape=False)
+        subject = ' '.join(self.subject.render(context).split())
+        return subject, self.message.render(context).strip()
+
+
+def invalidate_templates():
+    """Make every worker recompile its templates before the next render"""
+    cache.set(TEMPLATES_VERSION_KEY, uuid.uuid4().hex, None)
+    with _lock:
+        _compiled['loaded'] = False
+
+
+def _templates():
+    from notifications.models import NotificationTemplate
+
+    version = cache.get(TEMPLATES_VERSION_KEY)
+    if _compiled['loaded'] and _compiled['version'] == version:
+        return _compiled['templates']
+
+    with _lock:
+        if not _compiled['loaded'] or _compiled['version'] != version:
+            _compiled['templates'] = {
+                (template.name, template.language): CompiledTemplate(template)
+                for template in NotificationTemplate.objects.filter(is_active=True)
+            }
+            _compiled['version'] = version
+            _compiled['loaded'] = True
+        return _compiled['templates']
+
+
+def _language_chain(language):
+    chain = []
+    for candidate in (language, (language or '').split('-')[0], settings.DEFAULT_LANGUAGE, 'en'):
+        if candidate and candidate not in chain:
+            chain.append(candidate)
+    return chain
+
+
+def _lookup(templates, name, language):
+    for candidate in _language_chain(language):
+        template = templates.get((name, candidate))
+        if template is not None:
+            return template
+    raise TemplateNotFound(f"No active notification template {name!r} for language {language!r}")
+
+
+def get_template(name, language=None):
+    return _lookup(_templates(), name, language)
+
+
+def render(name, context, language=None):
+    """Render one template; returns (subject, message)"""
+    return get_template(name, language).render(context)
+
+
+def render_many(name, recipients):
+    """
+    Render a template for many recipients. `recipients` yields
+    (language, context) pairs; returns a list of (subject, message) in the
+    same order. The cache version is checked once for the whole batch.
+    """
+    templates = _templates()
+    by_language = {}
+    rendered = []
+    for language, context in recipients:
+        if language not in by_language:
+            by_language[language] = _lookup(templates, name, language)
+        rendered.append(by_language[language].render(context))
+    return rendered
@@ -0,0 +1,321 @@
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from datetime import timedelta
+from unittest import mock
+import uuid
+
+from .archive import archive_notifications
+from .channels import LocalPushChannel, load_channels
+from .digests import digest_window_end
+from .dispatch import (
+    claim_chunk, claimable_notifications, create_notifications, deliver_chunk, dispatch_pending_notifications
+)
+from .inbox import inbox, mark_read, unread_count
+from .models import (
+    Notification, NotificationArchive, NotificationDelivery, NotificationTemplate, UserNotificationSettings
+)
+
+User = get_user_model()
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def expire_leases():
+    Notification.objects.filter(claimed_until__isnull=False).update(
+        claimed_until=timezone.now() - timedelta(seconds=1)
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ClaimChunkTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='x')
+        for i in range(10):
+            Notification.objects.create(user=self.user, title=f"n{i}", message='m', notification_type='email')
+
+    def test_concurrent_claims_are_disjoint(self):
+        first = claim_chunk(claimable_notifications(), uuid.uuid4(), 6)
+        second = claim_chunk(claimable_notifications(), uuid.uuid4(), 6)
+
+        self.assertEqual(len(first), 6)
+        self.assertEqual(len(second), 4)
+        self.assertFalse({n.id for n in first} & {n.id for n in second})
+
+    def test_stale_candidates_are_not_stolen(self):
+        # Both runs picked the same candidates; only the first compare-and-set wins
+        candidates = claimable_notifications()
+        first = claim_chunk(candidates, uuid.uuid4(), 10)
+        second = claim_chunk(Notification.objects.filter(id__in=[n.id for n in first]), uuid.uuid4(), 10)
+
+        self.assertEqual(len(first), 10)
+        self.assertEqual(second, [])
+
+    def test_expired_lease_can_be_reclaimed(self):
+        claim_chunk(claimable_notifications(), uuid.uuid4(), 10)
+        self.assertFalse(claimable_notifications().exists())
+
+        expire_leases()
+        self.assertEqual(len(claim_chunk(claimable_notifications(), uuid.uuid4(), 10)), 10)
+
+    def test_sent_notifications_are_never_claimed(self):
+        Notification.objects.update(is_sent=True)
+        self.assertEqual(claim_chunk(claimable_notifications(), uuid.uuid4(), 10), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, NOTIFICATION_MAX_ATTEMPTS=3)
+class DeliveryRetryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bob', email='bob@example.com', password='x')
+        UserNotificationSettings.objects.create(user=self.user, push_predictions=True)
+        self.notification = Notification.objects.create(
+            user=self.user, title='Due soon', message='m', notification_type='email', category='predictions'
+        )
+
+    def channels(self):
+        return dict(self.notification.deliveries.values_list('channel', 'status'))
+
+    def test_retry_skips_channels_that_already_delivered(self):
+        with mock.patch.object(LocalPushChannel, 'send', side_effect=Exception('push down')):
+            self.assertEqual(dispatch_pending_notifications(), (0, 1))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(self.channels(), {'in_app': 'sent', 'email': 'sent', 'push': 'failed'})
+
+        expire_leases()
+        self.assertEqual(dispatch_pending_notifications(), (1, 0))
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(self.channels(), {'in_app': 'sent', 'email': 'sent', 'push': 'sent'})
+        self.notification.refresh_from_db()
+        self.assertTrue(self.notification.is_sent)
+        self.assertIsNone(self.notification.claim_token)
+
+    def test_lost_lease_is_not_counted_as_delivered(self):
+        cache.set(f"notifications:unread:{self.user.id}", 0)
+        token = uuid.uuid4()
+        chunk = claim_chunk(claimable_notifications(), token)
+
+        def reclaimed(notification):
+            # The lease ran out mid-send and another run took the notification over
+            Notification.objects.filter(pk=notification.pk).update(claim_token=uuid.uuid4())
+
+        channels = load_channels()
+        for backend in channels.values():
+            backend.open()
+            self.addCleanup(backend.close)
+        with mock.patch.object(LocalPushChannel, 'send', side_effect=reclaimed):
+            self.assertEqual(deliver_chunk(chunk, channels, token), (0, 0))
+
+        self.notification.refresh_from_db()
+        self.assertFalse(self.notification.is_sent)
+        self.assertEqual(unread_count(self.user), 0)
+
+    def test_lease_is_renewed_and_taken_over_rows_are_skipped(self):
+        other = Notification.objects.create(user=self.user, title='Other', message='m', category='predictions')
+        token = uuid.uuid4()
+        chunk = claim_chunk(claimable_notifications(), token)
+        Notification.objects.filter(pk__in=[n.pk for n in chunk]).update(claimed_until=timezone.now())
+
+        def taken_over(notification):
+            # Another run takes the second notification over while the first is being sent
+            Notification.objects.filter(pk=other.pk).update(claim_token=uuid.uuid4())
+
+        channels = load_channels()
+        for backend in channels.values():
+            backend.open()
+            self.addCleanup(backend.close)
+        with mock.patch.object(LocalPushChannel, 'send', side_effect=taken_over):
+            # A zero lease renews before every notification
+            self.assertEqual(deliver_chunk(chunk, channels, token, lease_seconds=0), (1, 0))
+
+        self.assertEqual([message.subject for message in mail.outbox], ['Due soon'])
+        self.assertFalse(NotificationDelivery.objects.filter(notification=other).exists())
+
+    def test_nothing_to_send_opens_no_mail_connection(self):
+        Notification.objects.update(is_sent=True)
+
+        with mock.patch('notifications.channels.get_connection') as get_connection:
+            self.assertEqual(dispatch_pending_notifications(), (0, 0))
+        get_connection.assert_not_called()
+
+    def test_gives_up_after_max_attempts(self):
+        with mock.patch.object(LocalPushChannel, 'send', side_effect=Exception('push down')):
+            for _ in range(4):
+                dispatch_pending_notifications()
+                expire_leases()
+
+        self.notification.refresh_from_db()
+        self.assertFalse(self.notification.is_sent)
+        self.assertEqual(self.notification.attempts, 3)
+        self.assertIsNotNone(self.notification.failed_at)
+        self.assertIsNone(self.notification.claim_token)
+        self.assertFalse(claimable_notifications().exists())
+
+    def test_missing_address_is_rejected_not_retried(self):
+        User.objects.filter(pk=self.user.pk).update(email='')
+
+        self.assertEqual(dispatch_pending_notifications(), (1, 0))
+
+        self.assertEqual(self.channels()['email'], 'rejected')
+        self.notification.refresh_from_db()
+        self.assertTrue(self.notification.is_sent)
+        self.assertEqual(NotificationDelivery.objects.filter(status='failed').count(), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CreateNotificationsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dave', email='dave@example.com', password='x')
+
+    def notification(self, priority, **kwargs):
+        return Notification(user=self.user, title='t', message='m', priority=priority, **kwargs)
+
+    @mock.patch('notifications.dispatch.queue_dispatch')
+    def test_due_immediate_priorities_are_kicked_once_on_commit(self, queue_dispatch):
+        later = timezone.now() + timedelta(hours=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_notifications([
+                self.notification('high'),
+                self.notification('urgent'),
+                self.notification('urgent'),
+                self.notification('urgent', scheduled_at=later),
+                self.notification('low'),
+            ])
+            queue_dispatch.assert_not_called()
+
+        self.assertEqual(Notification.objects.count(), 5)
+        self.assertEqual([c.args for c in queue_dispatch.call_args_list], [('urgent',), ('high',)])
+
+    @override_settings(NOTIFICATION_DIGEST_WINDOW_MINUTES=60)
+    def test_digestible_notifications_are_held_to_the_window_end(self):
+        now = timezone.now()
+        window_end = digest_window_end(now)
+        created = create_notifications([
+            self.notification('low', scheduled_at=now),
+            self.notification('medium', scheduled_at=now),
+            self.notification('high', scheduled_at=now),
+        ])
+
+        self.assertEqual([n.scheduled_at for n in created], [window_end, window_end, now])
+        self.assertEqual(list(claimable_notifications(now)), [created[2]])
+        self.assertEqual(claimable_notifications(window_end).count(), 3)
+
+    @override_settings(NOTIFICATION_DIGEST_WINDOW_MINUTES=60)
+    @mock.patch('notifications.dispatch.queue_dispatch')
+    def test_prediction_reminders_go_through_create_notifications(self, queue_dispatch):
+        from charts.models import ChartPrediction, Market
+        from charts.reminders import queue_prediction_reminders
+
+        NotificationTemplate.objects.get_or_create(name='prediction_reminder_digest', language='en', defaults={
+            'notification_type': 'email',
+            'subject_template': 'Predictions due soon',
+            'message_template': '{% for prediction in predictions %}{{ prediction.market.symbol }}{% endfor %}',
+        })
+        market = Market.objects.create(symbol='AAPL', name='Apple', market_type='us_stock', api_symbol='AAPL')
+        ChartPrediction.objects.create(
+            user=self.user, market=market, target_date=timezone.now() + timedelta(hours=1),
+            current_price=100, predicted_price=110, duration_days=1, status='pending'
+        )
+
+        with mock.patch('notifications.dispatch.create_notifications', wraps=create_notifications) as create:
+            self.assertEqual(queue_prediction_reminders(), (1, 1))
+
+        create.assert_called_once()
+        reminder = Notification.objects.get()
+        self.assertEqual(reminder.category, 'predictions')
+        self.assertGreater(reminder.scheduled_at, timezone.now())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class NotificationsApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='erin', email='erin@example.com', password='x')
+        self.client.force_login(self.user)
+        self.notifications = [
+            Notification.objects.create(user=self.user, title=f"n{i}", message='m', is_sent=True)
+            for i in range(3)
+        ]
+
+    def post(self, body):
+        return self.client.post('/notifications/api/notifications/', body, content_type='application/json')
+
+    def test_marks_listed_ids_read(self):
+        response = self.post({'ids': [self.notifications[0].id]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(response.json()['unread_count'], 2)
+
+    def test_marks_all_read(self):
+        response = self.post({'all': True})
+
+        self.assertEqual(response.json()['updated'], 3)
+        self.assertEqual(response.json()['unread_count'], 0)
+
+    def test_rejects_malformed_payloads(self):
+        for body in ('{not json', '[1, 2]', '"ids"', {'ids': '12'}, {'ids': [1, 'x']}, {'ids': [True]}, {'ids': {'1': 1}}):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+        self.assertFalse(Notification.objects.filter(is_read=True).exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, NOTIFICATION_ARCHIVE_AFTER_DAYS=90)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='fred', email='fred@example.com', password='x')
+
+    def notification(self, title, age_days=100, **fields):
+        notification = Notification.objects.create(user=self.user, title=title, message='m', **fields)
+        Notification.objects.filter(pk=notification.pk).update(
+            created_at=timezone.now() - timedelta(days=age_days)
+        )
+        return notification
+
+    def test_old_read_digested_and_failed_notifications_are_archived(self):
+        digested = [self.notification(f"d{i}", is_sent=True) for i in range(2)]
+        digest = self.notification('digest', is_sent=True, is_read=True)
+        Notification.objects.filter(pk__in=[n.pk for n in digested]).update(digest=digest)
+        self.notification('read', is_sent=True, is_read=True)
+        self.notification('failed', failed_at=timezone.now())
+        kept = [
+            self.notification('unread', is_sent=True).pk,
+            self.notification('pending').pk,
+            self.notification('recent', age_days=10, is_sent=True, is_read=True).pk,
+        ]
+
+        # One row per batch: digested rows must leave before their digest
+        self.assertEqual(archive_notifications(batch_size=1), 5)
+
+        self.assertEqual(sorted(Notification.objects.values_list('pk', flat=True)), kept)
+        self.assertEqual(
+            set(NotificationArchive.objects.values_list('title', flat=True)),
+            {'d0', 'd1', 'digest', 'read', 'failed'}
+        )
+        self.assertEqual(archive_notifications(), 0)
+
+    def test_max_batches_bounds_a_run(self):
+        for i in range(3):
+            self.notification(f"read{i}", is_sent=True, is_read=True)
+
+        self.assertEqual(archive_notifications(batch_size=2, max_batches=1), 2)
+        self.assertEqual(archive_notifications(batch_size=2), 1)
+
+    def test_unread_inbox_uses_the_partial_index(self):
+        for i in range(3):
+            self.notification(f"unread{i}", is_sent=True)
+        self.notification('read', is_sent=True, is_read=True)
+
+        self.assertEqual(unread_count(self.user), 3)
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Notification._meta.db_table)
+        self.assertIn('notification_unread_idx', constraints)
+        if connection.vendor == 'sqlite':
+            # PostgreSQL may still seq-scan a table this small
+            self.assertIn('notification_unread_idx', inbox(self.user).filter(is_read=False).explain())
+
+        self.assertEqual(mark_read(self.user), 3)
+        self.assertEqual(archive_notifications(), 4)
+        self.assertEqual(unread_count(self.user), 0)
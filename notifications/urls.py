@@ -6,4 +6,5 @@ app_name = 'notifications'
 urlpatterns = [
     path('ws/notifications/', views.websocket_placeholder, name='websocket_placeholder'),
     path('api/notifications/', views.notifications_api, name='notifications_api'),
+    path('api/notifications/unread-count/', views.unread_count_api, name='unread_count_api'),
 ]
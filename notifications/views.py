@@ -1,8 +1,14 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes
+from charts.pagination import keyset_page_for_request
+from . import inbox
 import json
 
+MARK_READ_MAX_IDS = 500
+
 
 @csrf_exempt 
 @require_http_methods(["GET"])
@@ -15,34 +21,66 @@ def websocket_placeholder(request):
     })
 
 
+def _notification_data(notification):
+    return {
+        'id': notification.id,
+        'type': notification.category,
+        'priority': notification.priority,
+        'title': notification.title,
+        'message': notification.message,
+        'timestamp': notification.created_at.isoformat(),
+        'read': notification.is_read
+    }
+
+
 @csrf_exempt
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
 def notifications_api(request):
-    """API endpoint for getting user notifications"""
-    if request.method == 'GET':
-        # Mock notifications data
-        notifications = [
-            {
-                'id': 1,
-                'type': 'prediction_result',
-                'title': 'Prediction Result',
-                'message': 'Your BTC prediction was successful!',
-                'timestamp': '2025-08-30T10:00:00Z',
-                'read': False
-            },
-            {
-                'id': 2,
-                'type': 'market_alert',
-                'title': 'Market Alert',
-                'message': 'AAPL reached your target price of $180',
-                'timestamp': '2025-08-30T09:30:00Z',
-                'read': True
-            }
-        ]
+    """
+    GET: the user's notifications, newest first, paged with ?cursor= (?unread=1 for unread only).
+    POST: mark notifications read, {"ids": [...]} or {"all": true}.
+    """
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body) if request.body else {}
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'Invalid JSON'}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({'success': False, 'message': 'Expected a JSON object'}, status=400)
+        
+        if data.get('all'):
+            updated = inbox.mark_read(request.user)
+        else:
+            ids = data.get('ids', [])
+            if not isinstance(ids, list) or not all(
+                isinstance(notification_id, int) and not isinstance(notification_id, bool)
+                for notification_id in ids
+            ):
+                return JsonResponse({'success': False, 'message': 'ids must be a list of notification ids'}, status=400)
+            updated = inbox.mark_read(request.user, ids[:MARK_READ_MAX_IDS])
         
         return JsonResponse({
             'success': True,
-            'notifications': notifications,
-            'unread_count': len([n for n in notifications if not n['read']])
+            'updated': updated,
+            'unread_count': inbox.unread_count(request.user)
         })
     
-    return JsonResponse({'error': 'Method not allowed'}, status=405)
+    notifications = inbox.inbox(request.user)
+    if request.GET.get('unread') in ('1', 'true'):
+        notifications = notifications.filter(is_read=False)
+    notifications_page = keyset_page_for_request(request, notifications)
+    
+    return JsonResponse({
+        'success': True,
+        'notifications': [_notification_data(notification) for notification in notifications_page],
+        'next_cursor': notifications_page.next_cursor,
+        'unread_count': inbox.unread_count(request.user)
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def unread_count_api(request):
+    """Unread notification count for the navbar badge; a single cache read"""
+    return JsonResponse({'unread_count': inbox.unread_count(request.user)})
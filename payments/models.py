@@ -191,3 +191,29 @@ class CryptoPayment(models.Model):
     
     def is_confirmed(self):
         return self.confirmations >= self.required_confirmations
+
+class LedgerEntry(models.Model):
+    """Money credited to or debited from a user, one row per movement"""
+    ENTRY_TYPES = (
+        ('contest_prize', 'Contest Prize'),
+        ('referral_payout', 'Referral Payout'),
+        ('adjustment', 'Adjustment'),
+    )
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ledger_entries')
+    entry_type = models.CharField(max_length=30, choices=ENTRY_TYPES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    currency = models.CharField(max_length=10, default='USD')
+    idempotency_key = models.CharField(max_length=200, unique=True, help_text="Guards against recording the same movement twice")
+    description = models.CharField(max_length=255, blank=True)
+    metadata = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.get_entry_type_display()} - ${self.amount}"
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'entry_type']),
+        ]
@@ -1,6 +1,7 @@
 import os
 from celery import Celery
 from django.conf import settings
+from kombu import Queue
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stockchart_project.settings')
@@ -11,6 +12,17 @@ app = Celery('stockchart_project')
 # the configuration object to child processes.
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
+# The default queue plus one queue per notification priority (see
+# notifications/dispatch.py). A plain `celery worker` consumes all of them;
+# pass -Q to give a priority its own worker.
+app.conf.task_queues = (
+    Queue('celery'),
+    Queue('notifications.urgent'),
+    Queue('notifications.high'),
+    Queue('notifications.medium'),
+    Queue('notifications.low'),
+)
+
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
@@ -24,9 +36,61 @@ app.conf.beat_schedule = {
         'task': 'charts.tasks.check_prediction_accuracy',
         'schedule': 3600.0,  # Every hour
     },
-    'send-notification-emails': {
+    'send-prediction-reminders': {
+        'task': 'charts.tasks.send_prediction_reminders',
+        'schedule': 900.0,  # Every 15 minutes, one digest per user
+    },
+    'flush-prediction-counters': {
+        'task': 'charts.tasks.flush_prediction_counters',
+        'schedule': 60.0,  # Every minute, views/likes are buffered in Redis
+    },
+    'rebase-trending-index': {
+        'task': 'charts.tasks.maintain_trending_index',
+        'schedule': 3600.0,  # Hourly, keeps decayed scores in floating point range
+    },
+    'refresh-site-stats': {
+        'task': 'charts.tasks.refresh_site_stats',
+        'schedule': 300.0,  # Every 5 minutes, home page reads the cached copy
+    },
+    'calculate-contest-rankings': {
+        'task': 'charts.tasks.calculate_contest_rankings',
+        'schedule': 300.0,  # Every 5 minutes, only contests with new settlements
+    },
+    'finalize-contest-standings': {
+        'task': 'charts.tasks.finalize_contest_standings',
+        'schedule': 60.0,  # Every minute, so final ranks land soon after a contest ends
+    },
+    'distribute-contest-prizes': {
+        'task': 'charts.tasks.distribute_contest_prizes',
+        'schedule': 300.0,  # Every 5 minutes, once standings are final
+    },
+    'send-urgent-notifications': {
         'task': 'notifications.tasks.send_pending_notifications',
-        'schedule': 600.0,  # Every 10 minutes
+        'schedule': 10.0,  # Backstop, urgent notifications are dispatched on creation
+        'kwargs': {'priority': 'urgent'},
+        'options': {'queue': 'notifications.urgent', 'expires': 10},
+    },
+    'send-high-notifications': {
+        'task': 'notifications.tasks.send_pending_notifications',
+        'schedule': 30.0,
+        'kwargs': {'priority': 'high'},
+        'options': {'queue': 'notifications.high', 'expires': 30},
+    },
+    'send-medium-notifications': {
+        'task': 'notifications.tasks.send_pending_notifications',
+        'schedule': 120.0,
+        'kwargs': {'priority': 'medium'},
+        'options': {'queue': 'notifications.medium', 'expires': 120},
+    },
+    'send-low-notifications': {
+        'task': 'notifications.tasks.send_pending_notifications',
+        'schedule': 600.0,  # Throttled by NOTIFICATION_SEND_LIMITS
+        'kwargs': {'priority': 'low'},
+        'options': {'queue': 'notifications.low', 'expires': 600},
+    },
+    'archive-notifications': {
+        'task': 'notifications.tasks.archive_notifications',
+        'schedule': 86400.0,  # Daily, keeps the live notifications table small
     },
     'process-referral-payouts': {
         'task': 'users.tasks.process_referral_payouts',
@@ -36,6 +100,14 @@ app.conf.beat_schedule = {
         'task': 'users.tasks.cleanup_expired_coupons',
         'schedule': 86400.0,  # Daily
     },
+    'update-user-accuracy-stats': {
+        'task': 'users.tasks.update_user_accuracy_stats',
+        'schedule': 86400.0,  # Nightly, incremental since the last run
+    },
+    'rebuild-leaderboards': {
+        'task': 'charts.tasks.rebuild_leaderboards',
+        'schedule': 86400.0,  # Daily reconciliation of incremental updates
+    },
 }
 
 app.conf.timezone = 'UTC'
@@ -335,6 +335,10 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 # Celery Settings
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
+# Notification dispatch runs on one queue per priority, declared in celery.py so a
+# default worker drains them all; give urgent its own worker with
+# celery -A stockchart_project worker -Q notifications.urgent
+CELERY_TASK_CREATE_MISSING_QUEUES = True
 
 # API Keys
 ALPHA_VANTAGE_API_KEY = config('ALPHA_VANTAGE_API_KEY', default='')
@@ -377,6 +381,21 @@ BASE_DOMAIN = config('BASE_DOMAIN', default='stockchartprediction.com')
 CONTEST_ENABLED = config('CONTEST_ENABLED', default=True, cast=bool)
 MAX_CONTEST_PARTICIPANTS = config('MAX_CONTEST_PARTICIPANTS', default=1000, cast=int)
 DEFAULT_CONTEST_PRIZE_POOL = config('DEFAULT_CONTEST_PRIZE_POOL', default=1000.00, cast=float)
+# Used when a contest has no prize_curve of its own; see charts/prizes.py
+DEFAULT_CONTEST_PRIZE_CURVE = {'type': 'top_n', 'shares': [50, 30, 20]}
+# Ended contests wait for participants' predictions to settle before standings are
+# final and prizes are paid, but no longer than this
+CONTEST_SETTLEMENT_GRACE_HOURS = config('CONTEST_SETTLEMENT_GRACE_HOURS', default=48, cast=int)
+
+# Ranking Settings
+RANKING_MIN_PREDICTIONS = config('RANKING_MIN_PREDICTIONS', default=5, cast=int)
+RANKING_PRIOR_MEAN = config('RANKING_PRIOR_MEAN', default=50.0, cast=float)
+RANKING_PRIOR_WEIGHT = config('RANKING_PRIOR_WEIGHT', default=5.0, cast=float)
+LEADERBOARD_CACHE_TIMEOUT = config('LEADERBOARD_CACHE_TIMEOUT', default=900, cast=int)
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=12.0, cast=float)
+
+# Prediction Reminders
+PREDICTION_REMINDER_WINDOW_HOURS = config('PREDICTION_REMINDER_WINDOW_HOURS', default=24, cast=int)
 
 # Free User Limits
 FREE_USER_CHART_VIEWS = config('FREE_USER_CHART_VIEWS', default=3, cast=int)
@@ -413,6 +432,29 @@ API_RATE_LIMIT_PER_MINUTE = config('API_RATE_LIMIT_PER_MINUTE', default=100, cas
 PUSH_NOTIFICATION_ENABLED = config('PUSH_NOTIFICATION_ENABLED', default=True, cast=bool)
 EMAIL_NOTIFICATION_ENABLED = config('EMAIL_NOTIFICATION_ENABLED', default=True, cast=bool)
 SMS_NOTIFICATION_ENABLED = config('SMS_NOTIFICATION_ENABLED', default=False, cast=bool)
+# Backend per delivery channel, see notifications/channels.py
+NOTIFICATION_CHANNEL_BACKENDS = {
+    'email': 'notifications.channels.EmailChannel',
+    'push': config('PUSH_NOTIFICATION_BACKEND', default='notifications.channels.LocalPushChannel'),
+    'sms': config('SMS_NOTIFICATION_BACKEND', default='notifications.channels.LocalSMSChannel'),
+    'in_app': 'notifications.channels.InAppChannel',
+}
+# Low and medium priority notifications are held for a window and delivered as one
+# digest per user; see notifications/digests.py (0 minutes = no holding)
+NOTIFICATION_DIGEST_WINDOW_MINUTES = config('NOTIFICATION_DIGEST_WINDOW_MINUTES', default=60, cast=int)
+NOTIFICATION_DIGEST_PRIORITIES = ('low', 'medium')
+# Read notifications older than this move to the archive table
+NOTIFICATION_ARCHIVE_AFTER_DAYS = config('NOTIFICATION_ARCHIVE_AFTER_DAYS', default=90, cast=int)
+# Failed delivery attempts before a notification is given up on
+NOTIFICATION_MAX_ATTEMPTS = config('NOTIFICATION_MAX_ATTEMPTS', default=5, cast=int)
+# Notifications a scheduled dispatch run sends per priority (0 = no limit); low priority
+# promotional sends trickle out instead of flooding the mail server
+NOTIFICATION_SEND_LIMITS = {
+    'urgent': 0,
+    'high': 0,
+    'medium': 0,
+    'low': config('NOTIFICATION_LOW_PRIORITY_SEND_LIMIT', default=200, cast=int),
+}
 
 # File Upload Settings
 MAX_UPLOAD_SIZE = config('MAX_UPLOAD_SIZE', default=5242880, cast=int)  # 5MB
@@ -459,7 +501,8 @@ SOCIALACCOUNT_PROVIDERS = {
     }
 }
 
-# Logging
+# Logging; the log directory isn't tracked, create it for the file handler
+os.makedirs(BASE_DIR / 'logs', exist_ok=True)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
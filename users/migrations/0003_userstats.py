@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_user_stats(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    UserStats = apps.get_model('users', 'UserStats')
+    
+    users = User.objects.filter(total_predictions__gt=0).only(
+        'pk', 'total_accuracy_rate', 'total_predictions'
+    )
+    UserStats.objects.bulk_create(
+        [
+            UserStats(
+                user_id=user.pk,
+                accuracy_sum=user.total_accuracy_rate * user.total_predictions,
+                completed_predictions=user.total_predictions,
+            )
+            for user in users.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_appsettings_coupon_socialpromotion_useraccesslog_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('accuracy_sum', models.FloatField(default=0.0)),
+                ('completed_predictions', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast
+
+
+def backfill_ranking_scores(apps, schema_editor):
+    ChartPrediction = apps.get_model('charts', 'ChartPrediction')
+    UserStats = apps.get_model('users', 'UserStats')
+    
+    confidence_weight = Cast('confidence_level', FloatField()) / 100.0
+    rows = ChartPrediction.objects.filter(
+        status='completed',
+        accuracy_percentage__isnull=False
+    ).values('user_id').annotate(
+        prediction_count=Count('id'),
+        weighted_accuracy_sum=Sum(F('accuracy_percentage') * confidence_weight),
+        confidence_weight_sum=Sum(confidence_weight),
+    )
+    
+    prior_weight = settings.RANKING_PRIOR_WEIGHT
+    for row in rows.iterator():
+        ranking_score = None
+        if row['prediction_count'] >= settings.RANKING_MIN_PREDICTIONS and row['confidence_weight_sum'] > 0:
+            ranking_score = (
+                (prior_weight * settings.RANKING_PRIOR_MEAN + row['weighted_accuracy_sum']) /
+                (prior_weight + row['confidence_weight_sum'])
+            )
+        UserStats.objects.filter(user_id=row['user_id']).update(
+            weighted_accuracy_sum=row['weighted_accuracy_sum'],
+            confidence_weight_sum=row['confidence_weight_sum'],
+            ranking_score=ranking_score,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('charts', '0002_initial'),
+        ('users', '0003_userstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='confidence_weight_sum',
+            field=models.FloatField(default=0.0, help_text='Sum of confidence_level / 100'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='ranking_score',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='weighted_accuracy_sum',
+            field=models.FloatField(default=0.0, help_text='Sum of accuracy x confidence weight'),
+        ),
+        migrations.RunPython(backfill_ranking_scores, migrations.RunPython.noop),
+    ]
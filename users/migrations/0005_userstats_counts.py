@@ -0,0 +1,67 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:16
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_counts(apps, schema_editor):
+    ChartPrediction = apps.get_model('charts', 'ChartPrediction')
+    ReferralSystem = apps.get_model('users', 'ReferralSystem')
+    UserStats = apps.get_model('users', 'UserStats')
+    
+    counts = {}
+    for row in ChartPrediction.objects.values('user_id').annotate(
+        created=Count('id'),
+        pending=Count('id', filter=Q(status='pending')),
+    ).iterator():
+        counts[row['user_id']] = {
+            'created_predictions': row['created'],
+            'pending_predictions': row['pending'],
+        }
+    for row in ReferralSystem.objects.values('referrer_id').annotate(
+        referrals=Count('id'),
+        earnings=Sum('commission_earned'),
+    ).iterator():
+        counts.setdefault(row['referrer_id'], {}).update({
+            'referral_count': row['referrals'],
+            'referral_earnings': row['earnings'] or 0,
+        })
+    
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id) for user_id in counts],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    for user_id, fields in counts.items():
+        UserStats.objects.filter(user_id=user_id).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_userstats_ranking_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='created_predictions',
+            field=models.IntegerField(default=0, help_text='Predictions made, any status'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='pending_predictions',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='referral_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='referral_earnings',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
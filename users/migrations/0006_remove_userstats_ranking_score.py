@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 05:01
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_userstats_counts'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userstats',
+            name='ranking_score',
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
 from django.utils import timezone
 import uuid
 import string
@@ -55,12 +56,171 @@ class User(AbstractUser):
             self.free_visits_remaining -= 1
             self.save()
     
-    def update_accuracy_rate(self, new_prediction_accuracy):
+    def update_accuracy_rate(self, new_prediction_accuracy, confidence_level=50):
         """Update user's overall accuracy rate"""
-        total_score = self.total_accuracy_rate * self.total_predictions
-        self.total_predictions += 1
-        self.total_accuracy_rate = (total_score + new_prediction_accuracy) / self.total_predictions
-        self.save()
+        UserStats.apply_deltas({
+            self.pk: UserStats.settlement_delta(new_prediction_accuracy, confidence_level)
+        })
+        self.refresh_from_db(fields=['total_accuracy_rate', 'total_predictions'])
+
+class UserStats(models.Model):
+    """Per-user prediction aggregates, updated with atomic increments"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='stats')
+    accuracy_sum = models.FloatField(default=0.0)
+    completed_predictions = models.IntegerField(default=0)
+    weighted_accuracy_sum = models.FloatField(default=0.0, help_text="Sum of accuracy x confidence weight")
+    confidence_weight_sum = models.FloatField(default=0.0, help_text="Sum of confidence_level / 100")
+    created_predictions = models.IntegerField(default=0, help_text="Predictions made, any status")
+    pending_predictions = models.IntegerField(default=0)
+    referral_count = models.IntegerField(default=0)
+    referral_earnings = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Delta tuples passed to apply_deltas, in order
+    DELTA_FIELDS = (
+        ('accuracy_sum', models.FloatField),
+        ('completed_predictions', models.IntegerField),
+        ('weighted_accuracy_sum', models.FloatField),
+        ('confidence_weight_sum', models.FloatField),
+    )
+    
+    # Plain counters maintained by adjust_counts
+    COUNT_FIELDS = {
+        'created_predictions': models.IntegerField,
+        'pending_predictions': models.IntegerField,
+        'referral_count': models.IntegerField,
+        'referral_earnings': models.DecimalField,
+    }
+    
+    # Users per increment UPDATE: each adds a WHEN to every CASE, which the
+    # database evaluates for every row, and a handful of bind parameters
+    DELTA_BATCH_SIZE = 200
+    
+    def __str__(self):
+        return f"Stats for {self.user.email}"
+    
+    @classmethod
+    def for_user(cls, user):
+        """The user's stats row, or an unsaved empty one if they have no activity yet"""
+        return cls.objects.filter(user=user).first() or cls(user=user)
+    
+    @property
+    def accuracy_rate(self):
+        """Average accuracy over completed predictions"""
+        if self.completed_predictions:
+            return self.accuracy_sum / self.completed_predictions
+        return 0.0
+    
+    @staticmethod
+    def settlement_delta(accuracy, confidence_level):
+        """Delta tuple contributed by one settled prediction"""
+        weight = confidence_level / 100.0
+        return (accuracy, 1, accuracy * weight, weight)
+    
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Apply a batch of {user_id: delta} increments, where each delta is a
+        (accuracy_sum, count, weighted_accuracy_sum, confidence_weight_sum)
+        tuple as built by settlement_delta().
+        
+        Runs a fixed number of statements per DELTA_BATCH_SIZE users and
+        mirrors the derived average onto the user's total_* columns.
+        """
+        deltas = {user_id: delta for user_id, delta in deltas.items() if delta[1]}
+        if not deltas:
+            return
+        
+        items = list(deltas.items())
+        with transaction.atomic():
+            for start in range(0, len(items), cls.DELTA_BATCH_SIZE):
+                batch = items[start:start + cls.DELTA_BATCH_SIZE]
+                increments = {}
+                for position, (field_name, field_class) in enumerate(cls.DELTA_FIELDS):
+                    cast = float if field_class is models.FloatField else int
+                    increments[field_name] = F(field_name) + Case(
+                        *[When(user_id=user_id, then=Value(cast(delta[position])))
+                          for user_id, delta in batch],
+                        default=Value(cast(0)),
+                        output_field=field_class()
+                    )
+                
+                user_ids = [user_id for user_id, _ in batch]
+                cls.objects.bulk_create(
+                    [cls(user_id=user_id) for user_id in user_ids],
+                    ignore_conflicts=True
+                )
+                cls.objects.filter(user_id__in=user_ids).update(
+                    updated_at=timezone.now(),
+                    **increments
+                )
+                cls.sync_user_totals(user_ids)
+    
+    @classmethod
+    def record_prediction_created(cls, user_id):
+        cls.adjust_counts({user_id: {'created_predictions': 1, 'pending_predictions': 1}})
+    
+    @classmethod
+    def record_prediction_deleted(cls, user_id, was_pending):
+        cls.adjust_counts({user_id: {
+            'created_predictions': -1,
+            'pending_predictions': -1 if was_pending else 0,
+        }})
+    
+    @classmethod
+    def adjust_counts(cls, deltas):
+        """
+        Apply {user_id: {field: amount}} to the COUNT_FIELDS counters with one
+        UPDATE per DELTA_BATCH_SIZE users. Call inside the transaction that
+        records the event itself.
+        """
+        deltas = {user_id: fields for user_id, fields in deltas.items() if any(fields.values())}
+        if not deltas:
+            return
+        
+        items = list(deltas.items())
+        with transaction.atomic():
+            for start in range(0, len(items), cls.DELTA_BATCH_SIZE):
+                batch = items[start:start + cls.DELTA_BATCH_SIZE]
+                increments = {}
+                for field_name, field_class in cls.COUNT_FIELDS.items():
+                    whens = [
+                        When(user_id=user_id, then=Value(fields[field_name]))
+                        for user_id, fields in batch if fields.get(field_name)
+                    ]
+                    if not whens:
+                        continue
+                    output_field = models.DecimalField(max_digits=10, decimal_places=2) \
+                        if field_class is models.DecimalField else field_class()
+                    increments[field_name] = F(field_name) + Case(
+                        *whens, default=Value(0), output_field=output_field
+                    )
+                
+                user_ids = [user_id for user_id, _ in batch]
+                cls.objects.bulk_create(
+                    [cls(user_id=user_id) for user_id in user_ids],
+                    ignore_conflicts=True
+                )
+                cls.objects.filter(user_id__in=user_ids).update(
+                    updated_at=timezone.now(),
+                    **increments
+                )
+    
+    @classmethod
+    def sync_user_totals(cls, user_ids):
+        """Copy derived totals onto User.total_accuracy_rate/total_predictions"""
+        stats = cls.objects.filter(user_id=OuterRef('pk'))
+        User.objects.filter(pk__in=user_ids).update(
+            total_predictions=Subquery(stats.values('completed_predictions')[:1]),
+            total_accuracy_rate=Subquery(stats.annotate(
+                rate=Case(
+                    When(completed_predictions__gt=0,
+                         then=F('accuracy_sum') / F('completed_predictions')),
+                    default=Value(0.0),
+                    output_field=models.FloatField()
+                )
+            ).values('rate')[:1])
+        )
 
 class UserProfile(models.Model):
     """Extended user profile information"""
@@ -225,6 +385,20 @@ class AppSettings(models.Model):
     def __str__(self):
         return f"Setting: {self.key}"
     
+    @classmethod
+    def get_value(cls, key, default=None):
+        """Return the active value stored under key, or default"""
+        value = cls.objects.filter(key=key, is_active=True).values_list('value', flat=True).first()
+        return default if value is None else value
+    
+    @classmethod
+    def set_value(cls, key, value, description=''):
+        """Create or overwrite the value stored under key"""
+        cls.objects.update_or_create(
+            key=key,
+            defaults={'value': str(value), 'description': description, 'is_active': True}
+        )
+    
     class Meta:
         verbose_name = "App Setting"
         verbose_name_plural = "App Settings"
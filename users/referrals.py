@@ -0,0 +1,141 @@
+"""
+Referral commission payouts.
+
+A referral earns REFERRAL_COMMISSION_RATE of everything its referred user
+has paid on active subscriptions, once that total reaches MIN_PAYOUT_AMOUNT,
+and is paid once. Eligible commissions for every unpaid referral come from
+a single grouped query. They are then applied in batches, each in one
+transaction: the referrals are claimed by a conditional UPDATE that only
+matches unpaid rows, and only the claimed ones are credited. Referrers'
+earnings_from_referrals and referral_earnings are incremented in the
+database with F() (never read-modify-write), and each payout gets a
+LedgerEntry whose idempotency key names the payout period and referral.
+"""
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Case, F, Q, Sum, Value, When
+from django.utils import timezone
+from decimal import Decimal, ROUND_DOWN
+import logging
+
+logger = logging.getLogger(__name__)
+
+PAYOUT_BATCH_SIZE = 1000
+
+
+def eligible_commissions():
+    """
+    [(referral_id, referrer_id, total_paid, commission)] for unpaid referrals
+    over the payout threshold, from one grouped query
+    """
+    from users.models import ReferralSystem
+
+    rate = Decimal(str(settings.REFERRAL_COMMISSION_RATE))
+    rows = ReferralSystem.objects.filter(commission_paid=False).annotate(
+        total_paid=Sum(
+            'referred_user__subscription_history__amount_paid',
+            filter=Q(referred_user__subscription_history__is_active=True)
+        )
+    ).filter(
+        total_paid__gte=Decimal(str(settings.MIN_PAYOUT_AMOUNT))
+    ).order_by('id').values_list('id', 'referrer_id', 'total_paid')
+
+    return [
+        (referral_id, referrer_id, total_paid, (total_paid * rate).quantize(Decimal('0.01'), rounding=ROUND_DOWN))
+        for referral_id, referrer_id, total_paid in rows
+    ]
+
+
+def _claim_referrals(payouts):
+    """
+    Mark referrals paid with a conditional UPDATE (WHERE commission_paid is
+    false) and return the ids this call actually claimed. A concurrent run
+    that got there first leaves nothing to claim, so no referral is credited
+    twice, with or without row locks.
+    """
+    from users.models import ReferralSystem
+
+    if connection.vendor == 'postgresql':
+        table = ReferralSystem._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE {table}
+                SET commission_paid = true
+                WHERE id = ANY(%s) AND commission_paid = false
+                RETURNING id
+            """, [[referral_id for referral_id, _, _, _ in payouts]])
+            return {row[0] for row in cursor.fetchall()}
+
+    return {
+        referral_id for referral_id, _, _, _ in payouts
+        if ReferralSystem.objects.filter(id=referral_id, commission_paid=False).update(commission_paid=True)
+    }
+
+
+def _pay_batch(batch, period):
+    """Pay one batch of eligible commissions; returns the commissions actually paid"""
+    from django.contrib.auth import get_user_model
+    from payments.models import LedgerEntry
+    from users.models import ReferralSystem, UserStats
+
+    User = get_user_model()
+
+    with transaction.atomic():
+        claimed = _claim_referrals(batch)
+        payouts = [payout for payout in batch if payout[0] in claimed]
+        if not payouts:
+            return []
+
+        ReferralSystem.objects.bulk_update([
+            ReferralSystem(id=referral_id, commission_earned=commission)
+            for referral_id, _, _, commission in payouts
+        ], ['commission_earned'])
+
+        earnings = {}
+        for _, referrer_id, _, commission in payouts:
+            earnings[referrer_id] = earnings.get(referrer_id, Decimal('0')) + commission
+
+        User.objects.filter(id__in=list(earnings)).update(
+            earnings_from_referrals=F('earnings_from_referrals') + Case(
+                *[When(id=referrer_id, then=Value(amount)) for referrer_id, amount in earnings.items()],
+                default=Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2)
+            )
+        )
+        UserStats.adjust_counts({
+            referrer_id: {'referral_earnings': amount} for referrer_id, amount in earnings.items()
+        })
+
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(
+                user_id=referrer_id,
+                entry_type='referral_payout',
+                amount=commission,
+                idempotency_key=f"referral-payout:{period}:{referral_id}",
+                description=f"Referral commission for payout period {period}",
+                metadata={'referral_id': referral_id, 'period': period, 'total_paid': str(total_paid)},
+            )
+            for referral_id, referrer_id, total_paid, commission in payouts
+        ], ignore_conflicts=True)
+
+    return payouts
+
+
+def pay_referral_commissions(period=None, batch_size=PAYOUT_BATCH_SIZE):
+    """
+    Pay every eligible referral commission for a payout period (the current
+    day by default). Returns (referrals paid, total commission).
+    """
+    period = period or timezone.now().date().isoformat()
+    eligible = eligible_commissions()
+
+    paid = 0
+    total = Decimal('0')
+    for start in range(0, len(eligible), batch_size):
+        payouts = _pay_batch(eligible[start:start + batch_size], period)
+        paid += len(payouts)
+        total += sum((commission for _, _, _, commission in payouts), Decimal('0'))
+
+    if paid:
+        logger.info(f"Paid {paid} referral commissions totalling ${total} for period {period}")
+    return paid, total
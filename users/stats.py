@@ -0,0 +1,150 @@
+"""
+Set-based maintenance of per-user prediction aggregates.
+
+Recomputes UserStats and the denormalized User.total_* columns from
+ChartPrediction with one grouped aggregation instead of a query per user.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+# SQLite fallback processes aggregated users in chunks of this size
+RECOMPUTE_CHUNK_SIZE = 1000
+
+
+def _touched_user_ids_sql(prediction_table):
+    return f"SELECT DISTINCT user_id FROM {prediction_table} WHERE updated_at >= %s"
+
+
+def _recompute_postgresql(since):
+    """Single grouped aggregation joined into UPDATE ... FROM statements"""
+    from charts.models import ChartPrediction
+    from users.models import User, UserStats
+    
+    prediction_table = ChartPrediction._meta.db_table
+    stats_table = UserStats._meta.db_table
+    user_table = User._meta.db_table
+    
+    params = []
+    touched_filter = ''
+    if since is not None:
+        touched_filter = f"AND user_id IN ({_touched_user_ids_sql(prediction_table)})"
+        params.append(since)
+    
+    aggregate_sql = f"""
+        SELECT user_id,
+               SUM(accuracy_percentage) AS accuracy_sum,
+               AVG(accuracy_percentage) AS accuracy_avg,
+               COUNT(*) AS prediction_count,
+               SUM(accuracy_percentage * confidence_level) / 100.0 AS weighted_accuracy_sum,
+               SUM(confidence_level) / 100.0 AS confidence_weight_sum
+        FROM {prediction_table}
+        WHERE status = 'completed'
+          AND accuracy_percentage IS NOT NULL
+          {touched_filter}
+        GROUP BY user_id
+    """
+    
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {stats_table} (
+                user_id, accuracy_sum, completed_predictions,
+                weighted_accuracy_sum, confidence_weight_sum, updated_at
+            )
+            SELECT agg.user_id, agg.accuracy_sum, agg.prediction_count,
+                   agg.weighted_accuracy_sum, agg.confidence_weight_sum, %s
+            FROM ({aggregate_sql}) AS agg
+            ON CONFLICT (user_id) DO UPDATE
+            SET accuracy_sum = EXCLUDED.accuracy_sum,
+                completed_predictions = EXCLUDED.completed_predictions,
+                weighted_accuracy_sum = EXCLUDED.weighted_accuracy_sum,
+                confidence_weight_sum = EXCLUDED.confidence_weight_sum,
+                updated_at = EXCLUDED.updated_at
+        """, [timezone.now()] + params)
+        
+        cursor.execute(f"""
+            UPDATE {user_table} AS u
+            SET total_accuracy_rate = agg.accuracy_avg,
+                total_predictions = agg.prediction_count
+            FROM ({aggregate_sql}) AS agg
+            WHERE u.id = agg.user_id
+        """, params)
+        updated_count = cursor.rowcount
+    
+    return updated_count
+
+
+def _recompute_chunked(since):
+    """Portable fallback: stream the grouped aggregation and apply it per chunk"""
+    from charts.models import ChartPrediction
+    from users.models import UserStats
+    
+    completed = ChartPrediction.objects.filter(
+        status='completed',
+        accuracy_percentage__isnull=False
+    )
+    if since is not None:
+        touched = ChartPrediction.objects.filter(updated_at__gte=since).values('user_id')
+        completed = completed.filter(user_id__in=touched)
+    
+    aggregates = completed.values('user_id').annotate(
+        accuracy_sum=Sum('accuracy_percentage'),
+        prediction_count=Count('id'),
+        weighted_accuracy_sum=Sum(
+            F('accuracy_percentage') * Cast('confidence_level', FloatField()) / 100.0
+        ),
+        confidence_weight_sum=Sum(Cast('confidence_level', FloatField()) / 100.0)
+    ).order_by('user_id')
+    
+    processed = 0
+    chunk = []
+    for row in aggregates.iterator(chunk_size=RECOMPUTE_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) >= RECOMPUTE_CHUNK_SIZE:
+            processed += _apply_chunk(UserStats, chunk)
+            chunk = []
+    if chunk:
+        processed += _apply_chunk(UserStats, chunk)
+    return processed
+
+
+def _apply_chunk(UserStats, rows):
+    now = timezone.now()
+    with transaction.atomic():
+        UserStats.objects.bulk_create(
+            [
+                UserStats(
+                    user_id=row['user_id'],
+                    accuracy_sum=row['accuracy_sum'],
+                    completed_predictions=row['prediction_count'],
+                    weighted_accuracy_sum=row['weighted_accuracy_sum'],
+                    confidence_weight_sum=row['confidence_weight_sum'],
+                    updated_at=now,
+                )
+                for row in rows
+            ],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=[
+                'accuracy_sum', 'completed_predictions',
+                'weighted_accuracy_sum', 'confidence_weight_sum', 'updated_at',
+            ],
+        )
+        UserStats.sync_user_totals([row['user_id'] for row in rows])
+    return len(rows)
+
+
+def recompute_accuracy_stats(since=None):
+    """
+    Rebuild accuracy aggregates from completed predictions.
+    
+    When since is given, only users with a prediction updated at or after
+    that time are recomputed. Returns the number of users updated.
+    """
+    if connection.vendor == 'postgresql':
+        return _recompute_postgresql(since)
+    return _recompute_chunked(since)
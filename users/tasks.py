@@ -6,43 +6,17 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+ACCURACY_STATS_LAST_RUN_KEY = 'user_accuracy_stats_last_run'
+
 @shared_task
 def process_referral_payouts():
     """Process pending referral payouts"""
     try:
-        from users.models import ReferralSystem
-        from users.models import UserSubscriptionHistory
-        
-        # Get unpaid referrals where referred user has made a payment
-        unpaid_referrals = ReferralSystem.objects.filter(
-            commission_paid=False,
-            referred_user__subscriptionhistory__is_active=True
-        ).distinct()
+        from users.referrals import pay_referral_commissions
         
-        for referral in unpaid_referrals:
-            # Calculate commission based on referred user's payments
-            from django.db.models import Sum
-            total_payments = UserSubscriptionHistory.objects.filter(
-                user=referral.referred_user,
-                is_active=True
-            ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0')
-            
-            if total_payments >= Decimal(str(settings.MIN_PAYOUT_AMOUNT)):
-                commission = total_payments * Decimal(str(settings.REFERRAL_COMMISSION_RATE))
-                
-                # Update referral record
-                referral.commission_earned = commission
-                referral.commission_paid = True
-                referral.save()
-                
-                # Update referrer's earnings
-                referrer = referral.referrer
-                referrer.earnings_from_referrals += commission
-                referrer.save()
-                
-                logger.info(f"Processed referral payout of ${commission} for {referrer.email}")
+        paid, total = pay_referral_commissions()
         
-        return f"Processed {unpaid_referrals.count()} referral payouts"
+        return f"Processed {paid} referral payouts (${total})"
     except Exception as e:
         logger.error(f"Error processing referral payouts: {str(e)}")
         return f"Error processing referral payouts: {str(e)}"
@@ -128,35 +102,27 @@ def create_social_promotion_coupon(promotion_id):
         return f"Error creating promotion coupon: {str(e)}"
 
 @shared_task 
-def update_user_accuracy_stats():
-    """Update user accuracy statistics"""
+def update_user_accuracy_stats(full=False):
+    """Update user accuracy statistics for users touched since the last run"""
     try:
-        from django.contrib.auth import get_user_model
-        from charts.models import ChartPrediction
-        from django.db.models import Avg, Count
+        from users.models import AppSettings
+        from users.stats import recompute_accuracy_stats
+        from django.utils.dateparse import parse_datetime
         
-        User = get_user_model()
+        started_at = timezone.now()
+        last_run = None if full else AppSettings.get_value(ACCURACY_STATS_LAST_RUN_KEY)
+        since = parse_datetime(last_run) if last_run else None
         
-        users_with_predictions = User.objects.filter(
-            predictions__status='completed'
-        ).distinct()
+        updated_count = recompute_accuracy_stats(since=since)
         
-        for user in users_with_predictions:
-            stats = ChartPrediction.objects.filter(
-                user=user,
-                status='completed',
-                accuracy_percentage__isnull=False
-            ).aggregate(
-                avg_accuracy=Avg('accuracy_percentage'),
-                total_predictions=Count('id')
-            )
-            
-            user.total_accuracy_rate = stats['avg_accuracy'] or 0.0
-            user.total_predictions = stats['total_predictions'] or 0
-            user.save()
+        AppSettings.set_value(
+            ACCURACY_STATS_LAST_RUN_KEY,
+            started_at.isoformat(),
+            description='Watermark for incremental user accuracy recomputation'
+        )
         
-        logger.info(f"Updated accuracy stats for {users_with_predictions.count()} users")
-        return f"Updated accuracy stats for {users_with_predictions.count()} users"
+        logger.info(f"Updated accuracy stats for {updated_count} users")
+        return f"Updated accuracy stats for {updated_count} users"
     except Exception as e:
         logger.error(f"Error updating user accuracy stats: {str(e)}")
         return f"Error updating user accuracy stats: {str(e)}"
@@ -1,3 +1,108 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from .models import ReferralSystem, User, UserStats, UserSubscriptionHistory
+from . import referrals
+from .referrals import _pay_batch, eligible_commissions, pay_referral_commissions
+from payments.models import LedgerEntry
+
+
+class UserStatsDeltaTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f"user{i}", email=f"user{i}@example.com", password='x')
+            for i in range(5)
+        ]
+
+    @mock.patch.object(UserStats, 'DELTA_BATCH_SIZE', 2)
+    def test_apply_deltas_across_batches(self):
+        UserStats.apply_deltas({
+            user.id: UserStats.settlement_delta(10.0 * (i + 1), 50) for i, user in enumerate(self.users)
+        })
+        UserStats.apply_deltas({self.users[0].id: UserStats.settlement_delta(30.0, 100)})
+
+        for i, user in enumerate(self.users):
+            stats = UserStats.objects.get(user=user)
+            user.refresh_from_db()
+            if i == 0:
+                self.assertEqual((stats.completed_predictions, stats.accuracy_sum), (2, 40.0))
+                self.assertAlmostEqual(stats.confidence_weight_sum, 1.5)
+            else:
+                self.assertEqual((stats.completed_predictions, stats.accuracy_sum), (1, 10.0 * (i + 1)))
+            self.assertEqual(user.total_predictions, stats.completed_predictions)
+            self.assertAlmostEqual(user.total_accuracy_rate, stats.accuracy_rate)
+
+    @mock.patch.object(UserStats, 'DELTA_BATCH_SIZE', 2)
+    def test_adjust_counts_across_batches(self):
+        UserStats.adjust_counts({
+            user.id: {'created_predictions': i + 1, 'referral_earnings': Decimal('1.50')}
+            for i, user in enumerate(self.users)
+        })
+        UserStats.adjust_counts({self.users[4].id: {'created_predictions': -1}})
+
+        counts = dict(UserStats.objects.values_list('user_id', 'created_predictions'))
+        self.assertEqual(counts, {user.id: i + 1 for i, user in enumerate(self.users[:4])} | {self.users[4].id: 4})
+        self.assertEqual(
+            set(UserStats.objects.values_list('referral_earnings', flat=True)), {Decimal('1.50')}
+        )
+
+
+@override_settings(REFERRAL_COMMISSION_RATE=0.15, MIN_PAYOUT_AMOUNT=50.00)
+class ReferralPayoutTests(TestCase):
+    def setUp(self):
+        self.referrer = User.objects.create_user(username='ref', email='ref@example.com', password='x')
+        self.paying = self.refer('paying', Decimal('80.00'), Decimal('40.00'))
+        self.small = self.refer('small', Decimal('30.00'))
+
+    def refer(self, username, *payments):
+        user = User.objects.create_user(username=username, email=f"{username}@example.com", password='x')
+        for amount in payments:
+            UserSubscriptionHistory.objects.create(
+                user=user, subscription_type='premium', start_date=timezone.now(),
+                payment_method='card', amount_paid=amount,
+            )
+        return ReferralSystem.objects.create(referrer=self.referrer, referred_user=user)
+
+    def assertPaidOnce(self):
+        self.referrer.refresh_from_db()
+        self.assertEqual(self.referrer.earnings_from_referrals, Decimal('18.00'))
+        self.assertEqual(UserStats.objects.get(user=self.referrer).referral_earnings, Decimal('18.00'))
+        self.assertEqual(
+            list(LedgerEntry.objects.values_list('entry_type', 'amount', 'idempotency_key')),
+            [('referral_payout', Decimal('18.00'), f"referral-payout:2026-01-01:{self.paying.id}")]
+        )
+
+    def test_pays_eligible_referrals_once(self):
+        self.assertEqual(pay_referral_commissions('2026-01-01'), (1, Decimal('18.00')))
+        self.assertEqual(pay_referral_commissions('2026-01-01'), (0, Decimal('0')))
+
+        self.paying.refresh_from_db()
+        self.small.refresh_from_db()
+        self.assertTrue(self.paying.commission_paid)
+        self.assertEqual(self.paying.commission_earned, Decimal('18.00'))
+        self.assertFalse(self.small.commission_paid)
+        self.assertPaidOnce()
+
+    def test_run_that_loses_the_claim_credits_nothing(self):
+        payouts = eligible_commissions()
+        claim = referrals._claim_referrals
+
+        def other_run_pays_first(batch):
+            with mock.patch.object(referrals, '_claim_referrals', claim):
+                _pay_batch(payouts, '2026-01-01')
+            return claim(batch)
+
+        with mock.patch.object(referrals, '_claim_referrals', side_effect=other_run_pays_first):
+            self.assertEqual(_pay_batch(payouts, '2026-01-01'), [])
+        self.assertPaidOnce()
+
+    def test_stale_payout_lists_credit_each_referral_once(self):
+        # Both runs computed their payouts before either one paid
+        first = eligible_commissions()
+        second = eligible_commissions()
+
+        self.assertEqual(len(_pay_batch(first, '2026-01-01')), 1)
+        self.assertEqual(_pay_batch(second, '2026-01-01'), [])
+        self.assertPaidOnce()
@@ -9,7 +9,8 @@ from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from .models import User, UserProfile, ReferralSystem
+from django.db import transaction
+from .models import User, UserProfile, ReferralSystem, UserStats
 import uuid
 import json
 
@@ -93,10 +94,12 @@ def register_view(request):
             if referral_code_used:
                 try:
                     referrer = User.objects.get(referral_code=referral_code_used)
-                    ReferralSystem.objects.create(
-                        referrer=referrer,
-                        referred_user=user
-                    )
+                    with transaction.atomic():
+                        ReferralSystem.objects.create(
+                            referrer=referrer,
+                            referred_user=user
+                        )
+                        UserStats.adjust_counts({referrer.id: {'referral_count': 1}})
                     if is_ajax:
                         pass  # Handle in response
                     else:
@@ -205,32 +208,18 @@ def profile_view(request):
         messages.success(request, 'Profile updated successfully!')
         return redirect('users:profile')
     
-    # Get user statistics
-    from charts.models import ChartPrediction
-    from payments.models import Subscription
-    
-    user_predictions = ChartPrediction.objects.filter(user=request.user)
-    total_predictions = user_predictions.count()
-    completed_predictions = user_predictions.filter(status='completed').count()
-    pending_predictions = user_predictions.filter(status='pending').count()
-    
-    # Get active subscription
-    active_subscription = Subscription.objects.filter(
-        user=request.user,
-        status='active'
-    ).first()
-    
-    # Get referrals
-    referrals = ReferralSystem.objects.filter(referrer=request.user)
+    # Everything on the page comes from the user row and its stats row
+    stats = UserStats.for_user(request.user)
     
     context = {
-        'total_predictions': total_predictions,
-        'completed_predictions': completed_predictions,
-        'pending_predictions': pending_predictions,
-        'active_subscription': active_subscription,
-        'referrals': referrals,
-        'referral_count': referrals.count(),
-        'total_earnings': sum(r.commission_earned for r in referrals),
+        'stats': stats,
+        'total_predictions': stats.created_predictions,
+        'completed_predictions': stats.completed_predictions,
+        'pending_predictions': stats.pending_predictions,
+        'is_premium': request.user.user_type == 'premium',
+        'premium_expiry_date': request.user.premium_expiry_date,
+        'referral_count': stats.referral_count,
+        'total_earnings': stats.referral_earnings,
     }
     
     return render(request, 'users/profile.html', context)